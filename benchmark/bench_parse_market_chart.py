@@ -0,0 +1,52 @@
+"""
+Micro-benchmark: legacy per-point list-comprehension parsing vs. the vectorized `parse_market_chart`.
+
+Run from the repository root:
+    python -m benchmark.bench_parse_market_chart
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from fetch_data.cg_parse import parse_market_chart
+
+def make_payload(n_points, step_ms=300_000, seed=0):
+    """Synthetic `/market_chart` payload with `n_points` points spaced `step_ms` apart (5-minute data by default)."""
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000_000 + np.arange(n_points, dtype='int64') * step_ms
+    return {key: [[int(t), float(v)] for t, v in zip(timestamps, rng.random(n_points) * 1e6)]
+            for key in ['prices', 'market_caps', 'total_volumes']}
+
+def parse_legacy(data):
+    return pd.DataFrame({
+                        "date": [pd.to_datetime(entry[0], unit="ms") for entry in data["prices"]],
+                        "price": [entry[1] for entry in data["prices"]],
+                        "market_cap": [entry[1] for entry in data["market_caps"]],
+                        "volume": [entry[1] for entry in data["total_volumes"]],
+                    })
+
+def best_of(function, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(sizes=(365, 2_160, 8_760, 105_120), repeat=3):
+    print(f"{'points':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+
+    for n_points in sizes:
+        data = make_payload(n_points)
+
+        legacy = parse_legacy(data)
+        vectorized = parse_market_chart(data)
+        pd.testing.assert_frame_equal(legacy.astype({'date': 'datetime64[ns]'}), vectorized.astype({'date': 'datetime64[ns]'}))
+
+        legacy_time = best_of(parse_legacy, data, repeat)
+        vectorized_time = best_of(parse_market_chart, data, repeat)
+        print(f"{n_points:>10} {legacy_time:>12.4f} {vectorized_time:>15.4f} {legacy_time / vectorized_time:>8.1f}x")
+
+if __name__ == "__main__":
+
+    run()
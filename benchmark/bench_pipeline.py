@@ -0,0 +1,106 @@
+"""
+Offline end-to-end benchmark: runs `cg_data_a_merge_init` against the mock CoinGecko server and a throwaway local
+DuckDB warehouse for several coin universe sizes, and reports API calls/s, rows/s, peak RSS and per-stage times.
+
+Each universe size runs in a fresh subprocess (so peak RSS is per run); the mock server runs in this process.
+
+Run from the repository root:
+    python -m benchmark.bench_pipeline --coins 100 1000 5000 --latency 0.02
+    python -m benchmark.bench_pipeline --coins 100 --calls-per-minute 600 --rate-limit 500
+    python -m benchmark.bench_pipeline --coins 1000 5000 --stream-chunk-size 250
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark.mock_coingecko import MockCoinGecko
+
+def run_worker(n_coins, days, max_in_flight, calls_per_minute, stream_chunk_size=None):
+    # Runs inside the subprocess: one full pipeline run, then a JSON result line on stdout
+    import cg_data_a_merge_init as pipeline
+    from bi_backend import DuckDBBackend
+    from fetch_data.cg_metrics import get_metrics
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backend = DuckDBBackend(os.path.join(tmp_dir, 'warehouse'))
+        kwargs = dict(cg_apikey='benchmark', last_x_days=days, calls_per_minute=calls_per_minute, max_in_flight=max_in_flight,
+                      cache_path=None, watermark_path=os.path.join(tmp_dir, 'watermarks.sqlite'), top_n=n_coins,
+                      backend=backend, stream_chunk_size=stream_chunk_size,
+                      final_pause=0) # The pause at the end of the pipeline would dominate the small universes
+
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            pipeline.cg_data_a_merge_init(**kwargs)
+        wall = time.perf_counter() - start
+
+        rows = int(backend.read(f"SELECT COUNT(*) AS n FROM {backend.table_ref('data_stage.cgc_market_chart_ohlc')}")['n'][0])
+
+    summary = get_metrics().summary()
+    print(json.dumps({
+        'wall': wall,
+        'rows': rows,
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'client_calls': sum(stats['requests'] for stats in summary['endpoints'].values()),
+        'stages': {name: stats['total'] for name, stats in summary['timers'].items() if name.startswith('stage: ')},
+    }))
+
+def run(sizes=(100, 1_000, 5_000), days=60, latency=0.0, throttle_rate=0.0, rate_limit=None, max_in_flight=10,
+        calls_per_minute=1_000_000, stream_chunk_size=None):
+    with MockCoinGecko(n_coins=max(sizes) + 100, latency=latency, throttle_rate=throttle_rate, rate_limit=rate_limit) as mock:
+        env = dict(os.environ, COINGECKO_BASE_URL=mock.base_url, BI_BACKEND='duckdb')
+        results = []
+
+        for n_coins in sizes:
+            calls_before = sum(mock.requests.values())
+            throttled_before = sum(mock.throttled.values())
+
+            command = [sys.executable, '-m', 'benchmark.bench_pipeline', '--worker', '--coins', str(n_coins), '--days', str(days),
+                       '--max-in-flight', str(max_in_flight), '--calls-per-minute', str(calls_per_minute)]
+            if stream_chunk_size:
+                command += ['--stream-chunk-size', str(stream_chunk_size)]
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise RuntimeError(f'Benchmark run for {n_coins} coins failed:\n{completed.stderr}')
+
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result['coins'] = n_coins
+            result['http_calls'] = sum(mock.requests.values()) - calls_before
+            result['throttled'] = sum(mock.throttled.values()) - throttled_before
+            results.append(result)
+
+    stage_names = sorted({name for result in results for name in result['stages']})
+    print(f"{'coins':>6} {'wall s':>8} {'HTTP calls':>10} {'429s':>5} {'calls/s':>8} {'rows':>9} {'rows/s':>9} {'peak RSS MB':>11}  "
+          + '  '.join(name.replace('stage: ', '') for name in stage_names))
+    for result in results:
+        print(f"{result['coins']:>6} {result['wall']:>8.2f} {result['http_calls']:>10} {result['throttled']:>5} "
+              f"{result['http_calls'] / result['wall']:>8.1f} {result['rows']:>9} {result['rows'] / result['wall']:>9.0f} "
+              f"{result['peak_rss'] / 1e6:>11.1f}  "
+              + '  '.join(f"{result['stages'].get(name, 0):>{len(name.replace('stage: ', ''))}.2f}" for name in stage_names))
+
+    return results
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--coins', type=int, nargs='+', default=[100, 1_000, 5_000])
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean mock response latency in seconds')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests randomly answered with HTTP 429')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Mock server calls/minute limit (429 above it)')
+    parser.add_argument('--max-in-flight', type=int, default=10)
+    parser.add_argument('--calls-per-minute', type=float, default=1_000_000)
+    parser.add_argument('--stream-chunk-size', type=int, default=None, help='Run the pipeline in streaming mode with chunks of this many coins')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.coins[0], args.days, args.max_in_flight, args.calls_per_minute, args.stream_chunk_size)
+    else:
+        run(args.coins, args.days, args.latency, args.throttle_rate, args.rate_limit, args.max_in_flight, args.calls_per_minute,
+            args.stream_chunk_size)
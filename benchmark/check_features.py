@@ -0,0 +1,56 @@
+"""
+Check the cg_features registry: the pandas (`compute_features`) and warehouse SQL (`features_sql`, run on DuckDB) paths
+give the same values, and market_dominance sums to 1 per calendar day across coins, including the current day where
+each coin's latest point carries its own fetch time.
+
+Run from the repository root:
+    python -m benchmark.check_features
+"""
+import duckdb
+import numpy as np
+import pandas as pd
+
+from cg_features import FEATURES, compute_features, features_sql
+
+def make_processed(n_coins=20, n_days=10, seed=0):
+    """Processed-table-like frame: daily points at 00:00 UTC (the last one at each coin's own fetch time) and a snapshot per coin."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2024-01-01', periods=n_days)
+    coins = [f'coin-{i}' for i in range(n_coins)]
+
+    df = pd.MultiIndex.from_product([coins, days], names=['coin_id', 'date']).to_frame(index=False)
+    latest = df['date'] == days[-1]
+    df.loc[latest, 'date'] += pd.to_timedelta(rng.integers(0, 86_400, latest.sum()), unit='s')
+    df['mkch_market_cap'] = rng.random(len(df)) * 1e9
+
+    snapshot = pd.DataFrame({
+        'coin_id': coins,
+        'cmrk_market_cap': rng.random(n_coins) * 1e9,
+        'cmrk_circulating_supply': rng.random(n_coins) * 1e6,
+        'cmrk_total_supply': np.where(rng.random(n_coins) < 0.2, 0, 2e6),
+        'cmrk_total_volume': rng.random(n_coins) * 1e8,
+        'cmrk_price_change_percentage_24h_in_currency': rng.normal(0, 5, n_coins),
+        'cmrk_price_change_percentage_1y_in_currency': np.where(rng.random(n_coins) < 0.2, np.nan, rng.normal(50, 100, n_coins)),
+    })
+    return df.merge(snapshot, on='coin_id')
+
+def run():
+    df = make_processed()
+
+    expected = compute_features(df)
+    result = duckdb.sql(f'SELECT *, {", ".join(features_sql())} FROM df').df()
+
+    columns = ['coin_id', 'date'] + [feature.name for feature in FEATURES]
+    pd.testing.assert_frame_equal(expected[columns].sort_values(['coin_id', 'date'], ignore_index=True),
+                                  result[columns].sort_values(['coin_id', 'date'], ignore_index=True),
+                                  check_dtype=False)
+    print(f"{len(FEATURES)} features : pandas and SQL results match on {len(df)} rows")
+
+    for name, frame in [('pandas', expected), ('SQL', result)]:
+        daily_total = frame.groupby(frame['date'].dt.normalize())['market_dominance'].sum()
+        np.testing.assert_allclose(daily_total, 1.0)
+        print(f"market_dominance ({name}) : sums to 1 on each of the {len(daily_total)} days")
+
+if __name__ == "__main__":
+
+    run()
@@ -0,0 +1,61 @@
+"""
+Check that the BigQuery upsert statement (`build_merge_sql`) and the local DuckDB upsert keep the same rows.
+
+DuckDBBackend writes upserts as an anti join instead of running `build_merge_sql`, so this script runs the MERGE
+itself on DuckDB (it only uses portable SQL) and compares both results on the same target / stage data.
+
+Run from the repository root:
+    python -m benchmark.check_merge_sql
+"""
+import tempfile
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from bi_backend import DuckDBBackend, build_merge_sql
+
+def make_history(coin_ids, dates, seed=0):
+    """Daily rows for every (coin, date) pair, with timestamps inside the day as in the market chart data."""
+    rng = np.random.default_rng(seed)
+    df = pd.MultiIndex.from_product([coin_ids, pd.to_datetime(dates)], names=['coin_id', 'date']).to_frame(index=False)
+    df['date'] = df['date'] + pd.to_timedelta(rng.integers(0, 86_400, len(df)), unit='s')
+    df['price'] = rng.random(len(df)) * 1e3
+    return df
+
+def merge_with_sql(target, stage, unique_col_ref, date_col_ref):
+    conn = duckdb.connect()
+    conn.register('target_df', target)
+    conn.register('stage_df', stage)
+    conn.execute('CREATE TABLE target AS SELECT * FROM target_df')
+    conn.execute('CREATE TABLE stage AS SELECT * FROM stage_df')
+    conn.execute(build_merge_sql('target', 'stage', list(stage.columns), unique_col_ref, date_col_ref))
+    return conn.execute('SELECT * FROM target').df()
+
+def merge_with_backend(target, stage, unique_col_ref, date_col_ref):
+    with tempfile.TemporaryDirectory() as root_dir:
+        backend = DuckDBBackend(root_dir)
+        backend.write(target, 'dataset.target', 'replace')
+        backend.write(stage, 'dataset.target', 'upsert', unique_col_ref, date_col_ref)
+        return backend.read('SELECT * FROM "dataset"."target"')
+
+def normalize(df):
+    return df.sort_values(list(df.columns), ignore_index=True).astype({'date': 'datetime64[us]'})
+
+def run():
+    dates = pd.date_range('2024-01-01', periods=30).strftime('%Y-%m-%d')
+    target = make_history([f'coin-{i}' for i in range(10)], dates[:25], seed=1)
+    # Overlapping days (replaced), new days (inserted) and a new coin; IDs in another case still match the target
+    stage = pd.concat([make_history([f'coin-{i}' for i in range(5)], dates[20:], seed=2),
+                       make_history(['COIN-7', 'coin-new'], dates[22:], seed=3)], ignore_index=True)
+
+    cases = [(['coin_id'], 'date'), (['coin_id'], None)]
+    for unique_col_ref, date_col_ref in cases:
+        expected = normalize(merge_with_sql(target, stage, unique_col_ref, date_col_ref))
+        result = normalize(merge_with_backend(target, stage, unique_col_ref, date_col_ref))
+        pd.testing.assert_frame_equal(expected, result)
+        print(f"unique_col_ref={unique_col_ref}, date_col_ref={date_col_ref} : {len(result)} rows, MERGE and DuckDBBackend match")
+
+if __name__ == "__main__":
+
+    run()
@@ -0,0 +1,266 @@
+"""
+Local stand-in for the CoinGecko API, for offline benchmarks of the fetch layer and the pipeline.
+
+Serves synthetic (deterministic) or recorded responses for /coins/markets, /coins/{id}/ohlc, /coins/{id}/market_chart,
+/coins/{id}/market_chart/range, /search/trending and /simple/price, with configurable latency and HTTP 429 injection.
+Point the fetch client at it with the COINGECKO_BASE_URL environment variable.
+
+Run from the repository root:
+    python -m benchmark.mock_coingecko --port 8765 --coins 1000 --latency 0.05 --throttle-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from fetch_data.cg_cache import ResponseCache
+
+API_PREFIX = '/api/v3'
+DAY_MS = 86_400_000
+
+def coin_id(rank):
+    return f'coin-{rank}'
+
+def _seed(coin):
+    return zlib.crc32(coin.encode())
+
+def _daily_timestamps(days):
+    today_ms = int(datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp() * 1000)
+    return [today_ms - i * DAY_MS for i in range(int(days), -1, -1)]
+
+def synthetic_market(rank):
+    coin = coin_id(rank)
+    rng = random.Random(_seed(coin))
+    price = rng.uniform(0.01, 50_000)
+    market_cap = 1e12 / (rank + 1)
+    return {
+        'id': coin, 'symbol': f'c{rank}', 'name': f'Coin {rank}', 'image': f'https://example.invalid/{coin}.png',
+        'current_price': price, 'market_cap': market_cap, 'market_cap_rank': rank + 1,
+        'fully_diluted_valuation': market_cap * 1.2, 'total_volume': market_cap * rng.uniform(0.01, 0.2),
+        'high_24h': price * 1.05, 'low_24h': price * 0.95, 'price_change_24h': price * 0.01,
+        'price_change_percentage_24h': rng.uniform(-10, 10), 'market_cap_change_24h': market_cap * 0.01,
+        'market_cap_change_percentage_24h': rng.uniform(-10, 10), 'circulating_supply': market_cap / price,
+        'total_supply': market_cap / price * 1.1, 'max_supply': None, 'ath': price * 2, 'ath_change_percentage': -50.0,
+        'ath_date': '2021-11-10T14:24:11.849Z', 'atl': price / 10, 'atl_change_percentage': 900.0,
+        'atl_date': '2015-10-20T00:00:00.000Z', 'roi': None, 'last_updated': datetime.now(timezone.utc).isoformat(),
+        **{f'price_change_percentage_{period}_in_currency': rng.uniform(-150, 300)
+           for period in ['1h', '24h', '7d', '14d', '30d', '200d', '1y']},
+    }
+
+def synthetic_series(coin, timestamps):
+    rng = random.Random(_seed(coin))
+    price = rng.uniform(0.01, 50_000)
+    points = {'prices': [], 'market_caps': [], 'total_volumes': []}
+    for ts in timestamps:
+        price *= rng.uniform(0.95, 1.05)
+        points['prices'].append([ts, price])
+        points['market_caps'].append([ts, price * 1e7])
+        points['total_volumes'].append([ts, price * 1e5])
+    return points
+
+def synthetic_ohlc(coin, days):
+    rng = random.Random(_seed(coin) + 1)
+    candles = []
+    for ts in _daily_timestamps(days):
+        close = rng.uniform(0.01, 50_000)
+        candles.append([ts, close * 0.99, close * 1.02, close * 0.97, close])
+    return candles
+
+def synthetic_trending(n_coins, count=15):
+    items = []
+    for score, rank in enumerate(random.Random(0).sample(range(n_coins), min(count, n_coins))):
+        coin = coin_id(rank)
+        items.append({'item': {
+            'id': coin, 'coin_id': rank, 'name': f'Coin {rank}', 'symbol': f'c{rank}', 'market_cap_rank': rank + 1,
+            'thumb': 'https://example.invalid/thumb.png', 'small': 'https://example.invalid/small.png',
+            'large': 'https://example.invalid/large.png', 'slug': coin, 'price_btc': 0.0001, 'score': score,
+            'data': {'price': 1.5, 'price_btc': '0.0001', 'price_change_percentage_24h': {'usd': 5.0, 'btc': 4.0},
+                     'market_cap': '$1,000,000', 'market_cap_btc': '10', 'total_volume': '$50,000',
+                     'total_volume_btc': '0.5', 'sparkline': 'https://example.invalid/sparkline.svg'},
+        }})
+    return {'coins': items, 'nfts': [], 'categories': []}
+
+def load_recorded(cache_path):
+    """
+    Recorded bodies from a fetch_data.cg_cache.ResponseCache SQLite file, by cache key (ResponseCache.make_key of the
+    request path and query parameters), so each request is answered with the response to the same parameters.
+    """
+    conn = sqlite3.connect(cache_path)
+    try:
+        rows = conn.execute('SELECT key, body FROM responses').fetchall()
+    finally:
+        conn.close()
+    return {key: body for key, body in rows}
+
+class MockCoinGecko:
+    """
+    Threaded mock CoinGecko server.
+
+    Parameters:
+    - n_coins (int): Size of the synthetic coin universe ('coin-0' ... ranked by market cap). Default: 5000.
+    - latency (float): Mean added response latency in seconds (uniform jitter of +/- 50%). Default: 0.
+    - throttle_rate (float): Share of requests randomly answered with HTTP 429 and a `Retry-After` header. Default: 0.
+    - retry_after (float): `Retry-After` seconds sent with randomly injected 429s. Default: 1.
+    - rate_limit (float, optional): Calls per minute allowed over a sliding 60-second window, like the real API's plan
+      limits. Requests above it get HTTP 429 with the seconds until the window frees up. Default: None (unlimited).
+    - recorded (dict, optional): Cache key -> recorded body (see load_recorded), served instead of synthetic data.
+    - host / port (str / int): Bind address. Port 0 picks a free port.
+    """
+
+    def __init__(self, n_coins=5000, latency=0.0, throttle_rate=0.0, retry_after=1.0, rate_limit=None, recorded=None,
+                 host='127.0.0.1', port=0):
+        self.n_coins = n_coins
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self._window = deque()
+        self.recorded = recorded or {}
+        self.requests = Counter()
+        self.throttled = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(42)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def response(self, path, query):
+        """Return (status, headers, body) for a request path (without the API prefix) and its parsed query."""
+        endpoint = re.sub(r'^/coins/(?!markets$)[^/]+', '/coins/{id}', path)
+
+        with self._lock:
+            self.requests[endpoint] += 1
+            now = time.monotonic()
+            retry_after = None
+
+            if self.rate_limit:
+                while self._window and self._window[0] <= now - 60:
+                    self._window.popleft()
+                if len(self._window) >= self.rate_limit:
+                    retry_after = max(1, round(self._window[0] + 60 - now))
+                else:
+                    self._window.append(now)
+            if retry_after is None and self._random.random() < self.throttle_rate:
+                retry_after = self.retry_after
+
+            delay = self.latency * self._random.uniform(0.5, 1.5) if self.latency else 0
+            if retry_after is not None:
+                self.throttled[endpoint] += 1
+
+        if delay:
+            time.sleep(delay)
+        if retry_after is not None:
+            return 429, {'Retry-After': str(retry_after)}, b'{"status": {"error_code": 429}}'
+
+        if self.recorded:
+            key = ResponseCache.make_key(path, {name: values[0] for name, values in query.items()})
+            if key in self.recorded:
+                return 200, {}, self.recorded[key]
+
+        body = self.synthetic(path, endpoint, query)
+        if body is None:
+            return 404, {}, b'{"error": "not found"}'
+        return 200, {}, json.dumps(body).encode()
+
+    def synthetic(self, path, endpoint, query):
+        param = lambda name, default=None: query.get(name, [default])[0]
+
+        if endpoint == '/coins/markets':
+            if param('ids'):
+                ranks = [int(coin.rsplit('-', 1)[1]) for coin in param('ids').split(',') if re.fullmatch(r'coin-\d+', coin)]
+                return [synthetic_market(rank) for rank in ranks if rank < self.n_coins]
+            per_page, page = int(param('per_page', 100)), int(param('page', 1))
+            return [synthetic_market(rank) for rank in range((page - 1) * per_page, min(page * per_page, self.n_coins))]
+
+        coin = path.split('/')[2] if endpoint.startswith('/coins/{id}') else None
+
+        if endpoint == '/coins/{id}/market_chart':
+            return synthetic_series(coin, _daily_timestamps(param('days', 30)))
+        if endpoint == '/coins/{id}/market_chart/range':
+            start_ms, end_ms = int(float(param('from'))) * 1000, int(float(param('to'))) * 1000
+            return synthetic_series(coin, [ts for ts in _daily_timestamps(4000) if start_ms <= ts <= end_ms])
+        if endpoint == '/coins/{id}/ohlc':
+            return synthetic_ohlc(coin, param('days', 30))
+        if endpoint == '/search/trending':
+            return synthetic_trending(self.n_coins)
+        if endpoint == '/simple/price':
+            currency = param('vs_currencies', 'usd')
+            return {coin: {currency: synthetic_market(int(coin.rsplit('-', 1)[1]))['current_price']}
+                    for coin in param('ids', '').split(',') if re.fullmatch(r'coin-\d+', coin)}
+        return None
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+                status, headers, body = mock.response(path, parse_qs(url.query, keep_blank_values=True))
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--coins', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--rate-limit', type=float, default=None, help='Allowed calls per minute (sliding window)')
+    parser.add_argument('--replay', help='ResponseCache SQLite file whose recorded responses are served first')
+    args = parser.parse_args()
+
+    server = MockCoinGecko(n_coins=args.coins, latency=args.latency, throttle_rate=args.throttle_rate,
+                           retry_after=args.retry_after, rate_limit=args.rate_limit, recorded=load_recorded(args.replay) if args.replay else None,
+                           host=args.host, port=args.port)
+    print(f'Mock CoinGecko API on {server.base_url} (set COINGECKO_BASE_URL to this value)')
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,278 @@
+import os
+import threading
+from datetime import datetime
+
+from dotenv import load_dotenv
+load_dotenv()
+
+DEFAULT_LOCAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.warehouse')
+
+# SQL HELPERS
+
+def build_key_conditions(unique_col_ref, date_col_ref=None, target_alias='target', stage_alias='temp'):
+    """Join condition matching a target row with a staged row on the upsert keys (case-insensitive IDs, same day)."""
+    return " AND ".join(
+        [f"UPPER({target_alias}.{col}) = UPPER({stage_alias}.{col})" for col in unique_col_ref] +
+        ([f"CAST({target_alias}.{date_col_ref} AS DATE) = CAST({stage_alias}.{date_col_ref} AS DATE)"] if date_col_ref else [])
+    )
+
+def build_merge_sql(target_ref, stage_ref, columns, unique_col_ref, date_col_ref=None):
+    """
+    Build the single-statement upsert used by write_method='upsert'.
+
+    Every (unique_col_ref, DATE(date_col_ref)) key present in the stage table replaces all matching rows of the target:
+    target rows with a staged key are deleted and all staged rows are inserted, atomically, in one MERGE.
+    The target is created from the stage schema first if it does not exist yet.
+    Only portable SQL is used (CAST AS DATE, explicit INSERT column list), so the statement also runs on DuckDB.
+
+    Parameters:
+    target_ref / stage_ref : fully qualified, already quoted table references. for example : '`project.dataset.table`'
+    columns : list of the column names to insert, in the order of the stage table
+    unique_col_ref / date_col_ref : same as write_table_by_unique_id
+    """
+    conditions = build_key_conditions(unique_col_ref, date_col_ref)
+    column_list = ", ".join(columns)
+    value_list = ", ".join(f"source.{col}" for col in columns)
+
+    return f'''
+        CREATE TABLE IF NOT EXISTS {target_ref} AS SELECT * FROM {stage_ref} WHERE FALSE;
+
+        MERGE INTO {target_ref} AS target
+        USING {stage_ref} AS source
+        ON FALSE
+        WHEN NOT MATCHED BY SOURCE AND EXISTS (
+            SELECT 1 FROM {stage_ref} AS temp
+            WHERE {conditions}
+        ) THEN DELETE
+        WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({value_list});
+    '''
+
+def _types_mapper(dtype_backend):
+    import pandas as pd
+
+    if dtype_backend not in (None, 'pyarrow'):
+        raise ValueError('The options for dtype_backend are None or "pyarrow".')
+    return pd.ArrowDtype if dtype_backend == 'pyarrow' else None
+
+# STORAGE BACKEND INTERFACE
+
+class WarehouseBackend:
+    """
+    Storage backend used by the pipeline scripts for every warehouse read and write.
+
+    Table names are always given as 'dataset.table' (e.g. 'data_stage.cgc_market_chart_ohlc'). SQL passed to `read`
+    and `execute` should reference tables through `table_ref`, so the same query runs on every backend.
+    """
+
+    name = None
+
+    def table_ref(self, table):
+        """Return the quoted, fully qualified reference for 'dataset.table' to embed in SQL."""
+        raise NotImplementedError
+
+    def read(self, sql, dtype_backend=None):
+        """
+        Run a query and return the result as a DataFrame.
+        dtype_backend: None (NumPy dtypes) or 'pyarrow' (Arrow-backed columns, pd.ArrowDtype).
+        """
+        raise NotImplementedError
+
+    def read_batches(self, sql, batch_size=100_000, dtype_backend=None):
+        """Run a query and yield the result as DataFrames of at most `batch_size` rows (Arrow record batches)."""
+        raise NotImplementedError
+
+    def execute(self, sql):
+        """Run a statement (DDL / DML) and wait for it to finish."""
+        raise NotImplementedError
+
+    def write(self, df, target_table, write_method, unique_col_ref=None, date_col_ref=None):
+        """
+        Write a DataFrame to 'dataset.table'.
+
+        Parameters:
+        write_method: replace / append / upsert (same semantics as bi_function.write_table_by_unique_id)
+        unique_col_ref / date_col_ref : key columns used by append / upsert
+        """
+        raise NotImplementedError
+
+    def write_tables(self, write_list, max_workers=5):
+        """
+        Write several independent tables concurrently and wait for all of them; the first error is raised once every
+        write has finished.
+
+        Parameters:
+        write_list: list of (df, target_table, write_method, unique_col_ref, date_col_ref) tuples, same meaning as `write`
+        max_workers: maximum number of tables written at the same time
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(item[1], executor.submit(self.write, *item)) for item in write_list]
+
+        errors = []
+        for target_table, future in futures:
+            if future.exception() is not None:
+                print(f"\033[1;31mError writing {target_table}: {future.exception()}\033[0m")
+                errors.append(future.exception())
+        if errors:
+            raise errors[0]
+
+    def create_table_as(self, target_table, select_sql):
+        """Replace 'dataset.table' with the result of `select_sql`, computed inside the warehouse."""
+        raise NotImplementedError
+
+class BigQueryBackend(WarehouseBackend):
+    """The original BigQuery implementation (bi_function's get_bi_client / write_table_by_unique_id)."""
+
+    name = 'bigquery'
+
+    def table_ref(self, table):
+        from bi_function import BI_PROJECT_ID
+        return f'`{BI_PROJECT_ID}.{table}`'
+
+    def read(self, sql, dtype_backend=None):
+        from bi_function import get_bi_client, read_from_gbq
+        return read_from_gbq(get_bi_client(), sql, dtype_backend=dtype_backend)
+
+    def read_batches(self, sql, batch_size=100_000, dtype_backend=None):
+        # Batch size is set by the storage API streams / REST pages
+        from bi_function import get_bi_client, read_from_gbq_batches
+        yield from read_from_gbq_batches(get_bi_client(), sql, dtype_backend=dtype_backend)
+
+    def execute(self, sql):
+        from bi_function import get_bi_client
+        get_bi_client().query(sql).result()
+
+    def write(self, df, target_table, write_method, unique_col_ref=None, date_col_ref=None):
+        from bi_function import write_table_by_unique_id
+        write_table_by_unique_id(df, target_table, write_method, unique_col_ref, date_col_ref=date_col_ref)
+
+    def write_tables(self, write_list, max_workers=5):
+        # Parquet load jobs submitted concurrently, then the upsert MERGEs submitted together
+        from bi_function import write_tables_by_unique_id
+        write_tables_by_unique_id(write_list, max_workers=max_workers)
+
+    def create_table_as(self, target_table, select_sql):
+        self.execute(f'CREATE OR REPLACE TABLE {self.table_ref(target_table)} AS {select_sql}')
+        print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+class DuckDBBackend(WarehouseBackend):
+    """
+    Embedded local warehouse: every table is one Parquet file at `<root_dir>/<dataset>/<table>.parquet`, queried
+    with DuckDB. Lets the pipeline run and be profiled offline at disk speed, without BigQuery credentials.
+
+    Parameters:
+    - root_dir (str): Directory holding the Parquet tables. Default: DEFAULT_LOCAL_DIR (`.warehouse/`).
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, root_dir=DEFAULT_LOCAL_DIR):
+        import duckdb
+
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._conn = duckdb.connect()
+        self._lock = threading.Lock()
+
+    def _path(self, table):
+        dataset, name = table.split('.')
+        return os.path.join(self.root_dir, dataset, f'{name}.parquet')
+
+    def _refresh_views(self):
+        for dataset in os.listdir(self.root_dir):
+            dataset_dir = os.path.join(self.root_dir, dataset)
+            if not os.path.isdir(dataset_dir):
+                continue
+            self._conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{dataset}"')
+            for file_name in os.listdir(dataset_dir):
+                if file_name.endswith('.parquet'):
+                    path = os.path.join(dataset_dir, file_name).replace("'", "''")
+                    self._conn.execute(f'''CREATE OR REPLACE VIEW "{dataset}"."{file_name[:-len('.parquet')]}" AS
+                                           SELECT * FROM read_parquet('{path}')''')
+
+    def _save(self, relation_sql, target_table):
+        from bi_function import atomic_path
+
+        path = self._path(target_table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_path(path) as tmp_path:
+            self._conn.execute(f"COPY ({relation_sql}) TO '{tmp_path}' (FORMAT parquet)")
+
+    def table_ref(self, table):
+        dataset, name = table.split('.')
+        return f'"{dataset}"."{name}"'
+
+    def read(self, sql, dtype_backend=None):
+        with self._lock:
+            self._refresh_views()
+            table = self._conn.execute(sql).fetch_arrow_table()
+        return table.to_pandas(types_mapper=_types_mapper(dtype_backend))
+
+    def read_batches(self, sql, batch_size=100_000, dtype_backend=None):
+        with self._lock:
+            self._refresh_views()
+            cursor = self._conn.cursor() # Own cursor, so other reads / writes can run while the batches are consumed
+            reader = cursor.execute(sql).fetch_record_batch(batch_size)
+
+        try:
+            for batch in reader:
+                yield batch.to_pandas(types_mapper=_types_mapper(dtype_backend))
+        finally:
+            cursor.close()
+
+    def execute(self, sql):
+        with self._lock:
+            self._refresh_views()
+            self._conn.execute(sql)
+
+    def write(self, df, target_table, write_method, unique_col_ref=None, date_col_ref=None):
+        print(f'write_method = {write_method}')
+
+        with self._lock:
+            self._conn.register('source_df', df)
+            try:
+                if write_method == 'replace' or not os.path.exists(self._path(target_table)):
+                    self._save('SELECT * FROM source_df', target_table)
+
+                elif write_method in ('append', 'upsert'):
+                    # Same key-replacement semantics as BigQuery's MERGE, written as a hash anti join (DuckDB runs the
+                    # MERGE ... ON FALSE form as a nested loop, which made every batched append rescan the whole table)
+                    path = self._path(target_table).replace("'", "''")
+                    conditions = build_key_conditions(unique_col_ref, date_col_ref)
+                    self._save(f'''SELECT * FROM read_parquet('{path}') AS target
+                                   WHERE NOT EXISTS (SELECT 1 FROM source_df AS temp WHERE {conditions})
+                                   UNION ALL BY NAME
+                                   SELECT * FROM source_df''', target_table)
+
+                else:
+                    raise ValueError('The options for write_method are "replace", "append" or "upsert".')
+            finally:
+                self._conn.unregister('source_df')
+
+        print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+    def create_table_as(self, target_table, select_sql):
+        with self._lock:
+            self._refresh_views()
+            self._save(select_sql, target_table)
+
+        print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+# BACKEND SELECTION
+
+def get_backend(name=None, **kwargs):
+    """
+    Return a storage backend by name: 'bigquery' or 'duckdb'.
+    Defaults to the BI_BACKEND environment variable, then 'bigquery'. The DuckDB root directory can also be set
+    with BI_LOCAL_DIR.
+    """
+    name = name or os.getenv('BI_BACKEND', 'bigquery')
+
+    if name == 'bigquery':
+        return BigQueryBackend(**kwargs)
+    if name == 'duckdb':
+        kwargs.setdefault('root_dir', os.getenv('BI_LOCAL_DIR', DEFAULT_LOCAL_DIR))
+        return DuckDBBackend(**kwargs)
+
+    raise ValueError(f"Unknown BI backend: {name}. Choose 'bigquery' or 'duckdb'.")
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bi_function import atomic_path
+
+DEFAULT_EXTRACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extract')
+EXTRACT_FORMATS = ['parquet', 'hyper']
+
+# LOCAL EXTRACTS
+# Columnar files for Tableau (or any reader) to refresh from, instead of going through Google Sheets:
+# - parquet : `<extract_dir>/<table>/<YYYY-MM-DD>.parquet`, one file per date partition (`all.parquet` when unpartitioned)
+# - hyper   : `<extract_dir>/<table>.hyper`, table "Extract"."Extract" (requires `pip install tableauhyperapi`)
+# Writes are incremental: a fingerprint of every partition is kept per format in `<extract_dir>/<table>/_manifest.json`,
+# and only the partitions that changed, appeared or disappeared since that format was last written are rewritten.
+
+UNPARTITIONED_KEY = 'all'
+
+def _partition_fingerprints(df, partition_col, sort_cols):
+    # One fingerprint per date partition, from the row hashes of the partition in a stable row order
+    if partition_col is None:
+        keys = pd.Series(UNPARTITIONED_KEY, index=df.index)
+    else:
+        keys = pd.to_datetime(df[partition_col]).dt.strftime('%Y-%m-%d')
+    order = df.assign(_key=keys).sort_values(['_key'] + sort_cols, kind='stable').index
+    row_hashes = pd.util.hash_pandas_object(df.loc[order], index=False).to_numpy()
+    sorted_keys = keys.loc[order].to_numpy()
+
+    fingerprints, partitions = {}, {}
+    boundaries = [0, *(np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1), len(sorted_keys)]
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        if start == end:
+            continue
+        key = sorted_keys[start]
+        fingerprints[key] = hashlib.blake2b(row_hashes[start:end].tobytes(), digest_size=16).hexdigest()
+        partitions[key] = order[start:end]
+    return fingerprints, partitions
+
+def _read_manifest(path):
+    if not os.path.exists(path):
+        return {'schema': None, 'formats': {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    if 'formats' not in manifest: # Manifest of a single shared state, which only tracked the Parquet partitions reliably
+        manifest['formats'] = {'parquet': manifest.pop('partitions', {})}
+    return manifest
+
+def _write_manifest(path, manifest):
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def _write_hyper(hyper_path, table_dir, changed, removed, rebuild, partition_col):
+    from tableauhyperapi import HyperProcess, Telemetry, Connection, CreateMode, TableName, escape_name, escape_string_literal
+
+    table = TableName('Extract', 'Extract')
+
+    with HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU) as hyper:
+        with Connection(endpoint=hyper.endpoint, database=hyper_path, create_mode=CreateMode.CREATE_IF_NOT_EXISTS) as connection:
+            connection.catalog.create_schema_if_not_exists('Extract')
+            if rebuild:
+                connection.execute_command(f'DROP TABLE IF EXISTS {table}')
+
+            stale = changed + removed
+            if partition_col is None and stale:
+                connection.execute_command(f'DROP TABLE IF EXISTS {table}')
+            elif connection.catalog.has_table(table) and stale:
+                dates = ', '.join(f"DATE {escape_string_literal(key)}" for key in stale)
+                connection.execute_command(f'DELETE FROM {table} WHERE CAST({escape_name(partition_col)} AS DATE) IN ({dates})')
+
+            # Hyper reads the freshly written Parquet partitions directly
+            for key in changed:
+                source = f"external({escape_string_literal(os.path.join(table_dir, f'{key}.parquet'))})"
+                if connection.catalog.has_table(table):
+                    connection.execute_command(f'INSERT INTO {table} SELECT * FROM {source}')
+                else:
+                    connection.execute_command(f'CREATE TABLE {table} AS (SELECT * FROM {source})')
+
+def write_extract(df, table_name, extract_dir=DEFAULT_EXTRACT_DIR, formats=('parquet',), partition_col='date', sort_cols=None):
+    """
+    Write `df` as a local columnar extract, incrementally per date partition.
+
+    Parameters:
+    - df (pd.DataFrame): Frame to write.
+    - table_name (str): Extract name, e.g. 'cgc_a_market_historical_processed'.
+    - extract_dir (str): Root directory of the extracts. Default: DEFAULT_EXTRACT_DIR (`.extract/`).
+    - formats (list): 'parquet' and / or 'hyper'. The Parquet partitions are always written, as the Hyper file is
+      loaded from them. Default: ('parquet',).
+    - partition_col (str): Date (or datetime) column the extract is partitioned by, or None for a single partition
+      (e.g. a small per-coin snapshot, rewritten whenever it changes). Default: 'date'.
+    - sort_cols (list): Columns giving a stable row order inside a partition (e.g. ['coin_id']), so the fingerprints do
+      not depend on the order the rows were read in. Default: None (rows kept in the given order).
+
+    Returns the list of rewritten Parquet partition keys ('YYYY-MM-DD', or 'all').
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    unknown = set(formats) - set(EXTRACT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown extract formats: {sorted(unknown)}. Choose from {EXTRACT_FORMATS}.")
+
+    table_dir = os.path.join(extract_dir, table_name)
+    manifest_path = os.path.join(table_dir, '_manifest.json')
+    os.makedirs(table_dir, exist_ok=True)
+
+    # One explicit schema for every partition, so a column that is empty on some dates keeps its type
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    schema_text = schema.to_string(show_schema_metadata=False)
+
+    fingerprints, partitions = _partition_fingerprints(df, partition_col, list(sort_cols or []))
+
+    manifest = _read_manifest(manifest_path)
+    rebuild = manifest['schema'] != schema_text
+    hyper_path = os.path.join(extract_dir, f'{table_name}.hyper')
+
+    def diff(extract_format):
+        # Partitions to rewrite / drop for one format against the fingerprints of its own last write, and whether the
+        # format has to be rebuilt from scratch (schema change, no state, or a deleted Hyper file)
+        previous = manifest['formats'].get(extract_format)
+        full = rebuild or previous is None or (extract_format == 'hyper' and not os.path.exists(hyper_path))
+        previous = previous or {}
+        changed = [key for key, fingerprint in fingerprints.items() if full or previous.get(key) != fingerprint]
+        return changed, [key for key in previous if key not in fingerprints], full
+
+    changed, removed, _ = diff('parquet')
+    for key in changed:
+        with atomic_path(os.path.join(table_dir, f'{key}.parquet')) as tmp_path:
+            pq.write_table(pa.Table.from_pandas(df.loc[partitions[key]], schema=schema, preserve_index=False), tmp_path)
+    for key in removed:
+        path = os.path.join(table_dir, f'{key}.parquet')
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Each format only advances its own fingerprints once written, so a failed (or skipped) format catches up on a later run
+    state = {} if rebuild else dict(manifest['formats'])
+    state['parquet'] = fingerprints
+    _write_manifest(manifest_path, {'schema': schema_text, 'formats': state})
+
+    if 'hyper' in formats:
+        hyper_changed, hyper_removed, hyper_rebuild = diff('hyper')
+        _write_hyper(hyper_path, table_dir, hyper_changed, hyper_removed, hyper_rebuild, partition_col)
+        state['hyper'] = fingerprints
+        _write_manifest(manifest_path, {'schema': schema_text, 'formats': state})
+
+    print(f"Extract written - {table_name} : {len(changed)} of {len(fingerprints)} partitions rewritten, "
+          f"{len(removed)} removed ({', '.join(formats)}) : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    return changed
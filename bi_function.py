@@ -1,30 +1,28 @@
 from datetime import datetime, timedelta, timezone
 from dateutil.relativedelta import relativedelta
-from gspread_dataframe import set_with_dataframe
-from oauth2client.service_account import ServiceAccountCredentials
-from openpyxl import load_workbook
-from pydrive.auth import GoogleAuth
-from pydrive.drive import GoogleDrive
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
-from google.cloud import bigquery
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+# Google clients (google-cloud-bigquery, googleapiclient, gspread, oauth2client) and openpyxl are imported lazily
+# inside the functions that need them, so importing this module stays cheap and works without credentials.
 
 import glob
-import gspread
 import numpy as np
 import sys,os
 import pandas as pd
 import platform
+import random
 import re
-import tzlocal
 import shutil
 import socket
 import subprocess
+import threading
 import time
 import warnings
 
+from bi_backend import build_merge_sql
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -47,13 +45,74 @@ service_account_bi = {
 }
 
 BI_PROJECT_ID = os.getenv("GBQ_PROJECT_ID")
-BI_CREDENTIAL = Credentials.from_service_account_info(service_account_bi)
-BI_CLIENT = bigquery.Client.from_service_account_info(service_account_bi)
+
+# Clients are created on first use and cached. BI_CREDENTIAL, BI_CLIENT and gs_client remain importable
+# as module attributes (resolved lazily through __getattr__ below).
+
+@lru_cache(maxsize=None)
+def get_bi_credential():
+    from google.oauth2.service_account import Credentials
+    return Credentials.from_service_account_info(service_account_bi)
+
+@lru_cache(maxsize=None)
+def get_bi_client():
+    from google.cloud import bigquery
+    return bigquery.Client.from_service_account_info(service_account_bi)
+
+@lru_cache(maxsize=None)
+def get_gs_client():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    gs_credentials = ServiceAccountCredentials.from_json_keyfile_dict(service_account_bi, ['https://spreadsheets.google.com/feeds'])
+    return gspread.authorize(gs_credentials)
+
+_LAZY_ATTRIBUTES = {
+    'BI_CREDENTIAL': get_bi_credential,
+    'BI_CLIENT': get_bi_client,
+    'gs_client': get_gs_client,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@lru_cache(maxsize=None)
+def get_bqstorage_client():
+    """BigQuery Storage Read API client, or None when google-cloud-bigquery-storage is not installed (REST fallback)."""
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+    return bigquery_storage.BigQueryReadClient(credentials=get_bi_credential())
 
 # FUNCTION READ GBQ
 
-def read_from_gbq(client, sql):
-    return client.query(sql).to_dataframe()
+def read_from_gbq(client, sql, use_storage_api=True, dtype_backend=None):
+    """
+    Parameters:
+    use_storage_api : download the result through the BigQuery Storage Read API (parallel Arrow streams) instead of
+                      paging through the REST API. Falls back to REST when google-cloud-bigquery-storage is not installed.
+    dtype_backend : None (NumPy dtypes) or 'pyarrow' (every column stays Arrow-backed, pd.ArrowDtype, no object columns)
+    """
+    rows = client.query(sql).result()
+    bqstorage_client = get_bqstorage_client() if use_storage_api else None
+
+    if dtype_backend == 'pyarrow':
+        return rows.to_arrow(bqstorage_client=bqstorage_client, create_bqstorage_client=False).to_pandas(types_mapper=pd.ArrowDtype)
+    return rows.to_dataframe(bqstorage_client=bqstorage_client, create_bqstorage_client=False)
+
+def read_from_gbq_batches(client, sql, use_storage_api=True, dtype_backend=None):
+    """
+    Same as read_from_gbq, but yields the result as a sequence of DataFrames (one per Arrow record batch) so callers
+    can process large results without holding them in memory at once.
+    """
+    rows = client.query(sql).result()
+    bqstorage_client = get_bqstorage_client() if use_storage_api else None
+    types_mapper = pd.ArrowDtype if dtype_backend == 'pyarrow' else None
+
+    for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+        yield batch.to_pandas(types_mapper=types_mapper)
 
 # FUNCTION WRITE GBQ
 
@@ -61,19 +120,36 @@ def write_to_gbq(df, project_id, credential, target_table, import_method, job_lo
     df.to_gbq(target_table, project_id=project_id, if_exists=import_method, location=job_location, progress_bar=False,
               credentials=credential)
 
+def load_to_gbq(df, target_table, import_method, job_location='asia-southeast2'):
+    """
+    Serialize df to Parquet and submit a BigQuery load job without waiting for it. Call `.result()` on the returned
+    job to wait. import_method: replace / append
+    """
+    from google.cloud import bigquery
+
+    write_disposition = 'WRITE_TRUNCATE' if import_method == 'replace' else 'WRITE_APPEND'
+    job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET, write_disposition=write_disposition)
+
+    return get_bi_client().load_table_from_dataframe(df, f'{BI_PROJECT_ID}.{target_table}', job_config=job_config,
+                                                     location=job_location)
+
 def write_table_by_unique_id(df, target_table, write_method, unique_col_ref, date_col_ref=None):
 
     """
     Parameters:
-    write_method: replace / append
+    write_method: replace / append / upsert
+        - append : loads the keys to a stage table, deletes matching rows, then appends df (3 round trips, not atomic)
+        - upsert : loads df once to a stage table and applies it with a single MERGE (see build_merge_sql)
     unique_col_ref : must be a list contains the column name where the data type is string, even if it's only have one value. for example : ['store_id']
     date_col_ref : must be a single variable, 1 column name with date data type. for example : 'order_creation_time'
     """
 
+    stage_table = f"data_stage.{target_table.replace('.', '_')}"
+
     if write_method == 'replace':
         print(f'write_method = {write_method}')
         
-        write_to_gbq(df, BI_PROJECT_ID, BI_CREDENTIAL, target_table, 'replace', 'asia-southeast2')
+        write_to_gbq(df, BI_PROJECT_ID, get_bi_credential(), target_table, 'replace', 'asia-southeast2')
 
     elif write_method == 'append':
         print(f'write_method = {write_method}')
@@ -103,8 +179,7 @@ def write_table_by_unique_id(df, target_table, write_method, unique_col_ref, dat
             )
 
         # Load Temporary Table
-        stage_table = f'data_stage.{target_table.replace('.', '_')}'
-        write_to_gbq(df_temp, BI_PROJECT_ID, BI_CREDENTIAL, stage_table, 'replace', 'asia-southeast2')
+        write_to_gbq(df_temp, BI_PROJECT_ID, get_bi_credential(), stage_table, 'replace', 'asia-southeast2')
         time.sleep(2)
 
         # Delete Origin Table
@@ -117,22 +192,108 @@ def write_table_by_unique_id(df, target_table, write_method, unique_col_ref, dat
         '''
 
         try:
-            query_job = BI_CLIENT.query(delete_sql)
+            query_job = get_bi_client().query(delete_sql)
             query_job.result()  # Wait for the job to complete
 
             print(f"Total rows deleted: {query_job.num_dml_affected_rows}")
             print(f'Total rows to upload: {len(df)}')
             
             # Upload data to BigQuery
-            write_to_gbq(df, BI_PROJECT_ID, BI_CREDENTIAL, target_table, 'append', 'asia-southeast2')
+            write_to_gbq(df, BI_PROJECT_ID, get_bi_credential(), target_table, 'append', 'asia-southeast2')
             print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
 
         except Exception as e:
             print(f"\033[1;31mError during delete and load process: {e}\033[0m")
             raise
 
+    elif write_method == 'upsert':
+        print(f'write_method = {write_method}')
+
+        # Load Full Data to Stage Table (once)
+        write_to_gbq(df, BI_PROJECT_ID, get_bi_credential(), stage_table, 'replace', 'asia-southeast2')
+
+        # Apply with a Single MERGE
+        merge_sql = build_merge_sql(f'`{BI_PROJECT_ID}.{target_table}`', f'`{BI_PROJECT_ID}.{stage_table}`', list(df.columns),
+                                    unique_col_ref, date_col_ref)
+
+        try:
+            query_job = get_bi_client().query(merge_sql)
+            query_job.result()  # Wait for the job to complete
+
+            print(f'Total rows upserted: {len(df)}')
+            print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+        except Exception as e:
+            print(f"\033[1;31mError during merge process: {e}\033[0m")
+            raise
+
     else:
-        print(f'\033[1;31mThe options for the write_table method are either "replace" or "append". Please choose the correct one.\033[0m')
+        print(f'\033[1;31mThe options for the write_table method are "replace", "append" or "upsert". Please choose the correct one.\033[0m')
+
+def write_tables_by_unique_id(write_list, max_workers=5):
+
+    """
+    Write several independent tables at once. Total time approaches that of the slowest table instead of the sum.
+
+    Parameters:
+    write_list : list of (df, target_table, write_method, unique_col_ref, date_col_ref) tuples, same meaning as
+                 write_table_by_unique_id
+    max_workers : maximum number of frames serialized / uploaded at the same time
+
+    - replace / upsert : every frame is loaded as Parquet through concurrent load jobs (upsert to its stage table),
+                         then all upsert MERGE statements are submitted together and awaited
+    - append : runs write_table_by_unique_id on the same pool
+    All writes are awaited, then the first error (if any) is raised.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    for _, target_table, write_method, _, _ in write_list:
+        if write_method not in ('replace', 'append', 'upsert'):
+            raise ValueError(f'The options for write_method are "replace", "append" or "upsert" ({target_table}).')
+
+    def load(df, target_table, write_method, unique_col_ref, date_col_ref):
+        if write_method == 'append':
+            write_table_by_unique_id(df, target_table, write_method, unique_col_ref, date_col_ref=date_col_ref)
+            return
+
+        load_table = target_table if write_method == 'replace' else f"data_stage.{target_table.replace('.', '_')}"
+        load_to_gbq(df, load_table, 'replace').result()
+
+        if write_method == 'replace':
+            print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+
+    errors = []
+
+    # 1. Parquet Load Jobs (concurrent)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(item[1], executor.submit(load, *item)) for item in write_list]
+
+    for target_table, future in futures:
+        if future.exception() is not None:
+            print(f"\033[1;31mError loading {target_table}: {future.exception()}\033[0m")
+            errors.append(future.exception())
+
+    # 2. MERGE the Staged Upserts (submitted together, awaited together)
+    loaded = {target_table for target_table, future in futures if future.exception() is None}
+    merge_jobs = []
+    for df, target_table, write_method, unique_col_ref, date_col_ref in write_list:
+        if write_method == 'upsert' and target_table in loaded:
+            stage_table = f"data_stage.{target_table.replace('.', '_')}"
+            merge_sql = build_merge_sql(f'`{BI_PROJECT_ID}.{target_table}`', f'`{BI_PROJECT_ID}.{stage_table}`', list(df.columns),
+                                        unique_col_ref, date_col_ref)
+            merge_jobs.append((target_table, len(df), get_bi_client().query(merge_sql)))
+
+    for target_table, n_rows, query_job in merge_jobs:
+        try:
+            query_job.result()
+            print(f'Total rows upserted: {n_rows}')
+            print(f"Data uploaded - {target_table} : {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        except Exception as e:
+            print(f"\033[1;31mError during merge process ({target_table}): {e}\033[0m")
+            errors.append(e)
+
+    if errors:
+        raise errors[0]
 
 # # Example Usage:
 # write_table_by_unique_id(df,
@@ -143,11 +304,9 @@ def write_table_by_unique_id(df, target_table, write_method, unique_col_ref, dat
 #                         )
 
 # GOOGLE SHEETS & GOOGLE DRIVE
-gs_credentials = ServiceAccountCredentials.from_json_keyfile_dict(service_account_bi, ['https://spreadsheets.google.com/feeds'])
-gs_client = gspread.authorize(gs_credentials)
 
 def read_gsheet(gs_title, sheet_name, first_row=0):
-    ws = gs_client.open(gs_title)
+    ws = get_gs_client().open(gs_title)
     sh = ws.worksheet(sheet_name)
     sh = sh.get_all_values()[first_row:]
     sh = pd.DataFrame.from_dict(sh)
@@ -158,29 +317,185 @@ def read_gsheet(gs_title, sheet_name, first_row=0):
 
     return df
 
-def write_to_gsheet(dataframe, spreadsheet_id, worksheet_id, gs_client, clear_old_data=True, new_title=None):
+DEFAULT_GSHEET_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state', 'gsheet')
+GSHEET_RETRY_CODES = {429, 500, 503}
+
+def _gsheet_call(func, *args, max_retries=5, backoff_base=2, **kwargs):
+    # Retry quota (429) and transient (5xx) Sheets API errors with exponential backoff and full jitter
+    from gspread.exceptions import APIError
+
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except APIError as e:
+            if e.code not in GSHEET_RETRY_CODES or attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(64, backoff_base * 2 ** attempt))
+            print(f"\033[1;33mSheets API error {e.code}, retrying in {delay:.1f} s\033[0m")
+            time.sleep(delay)
+
+def _gsheet_cells(dataframe):
+    """
+    Header + rows of `dataframe` as the cell values sent to Sheets (same rendering as gspread_dataframe's
+    set_with_dataframe: numbers as numbers, missing values as '', everything else as text), plus one uint64
+    fingerprint per cell.
+    """
+    columns = [[str(col) for col in dataframe.columns]]
+    for col in dataframe.columns:
+        series = dataframe[col]
+        values = series.astype(object).where(series.notna(), '')
+        if pd.api.types.is_numeric_dtype(series):
+            values = values.tolist()
+        else:
+            values = [f"'{v}" if v.startswith('=') else v for v in values.astype(str)] # No formulas, like allow_formulas=False
+        columns.append(values)
+
+    header, body = columns[0], columns[1:]
+    rows = [header] + [list(row) for row in zip(*body)] if body else [header]
+
+    fingerprints = np.empty((len(rows), len(header)), dtype=np.uint64)
+    fingerprints[0] = pd.util.hash_array(np.array(header, dtype=object))
+    for i, values in enumerate(body):
+        fingerprints[1:, i] = pd.util.hash_array(np.array([repr(v) for v in values], dtype=object))
+
+    return rows, fingerprints
+
+def _changed_ranges(fingerprints, previous):
+    """
+    Compare the cell fingerprints with the ones of the last sync and return the changed cells as rectangles
+    (first_row, last_row, first_col, last_col), 0-based and inclusive. Consecutive rows with the same changed
+    column span are merged into one rectangle. Everything is changed when there is no usable previous state.
+    """
+    n_rows, n_cols = fingerprints.shape
+    changed = np.ones((n_rows, n_cols), dtype=bool)
+    if previous is not None and previous.shape[1] == n_cols:
+        overlap = min(n_rows, previous.shape[0])
+        changed[:overlap] = fingerprints[:overlap] != previous[:overlap]
+
+    changed_rows = np.flatnonzero(changed.any(axis=1))
+    first_cols = changed.argmax(axis=1)
+    last_cols = n_cols - 1 - changed[:, ::-1].argmax(axis=1)
+
+    ranges = []
+    for row in changed_rows:
+        span = (first_cols[row], last_cols[row])
+        if ranges and ranges[-1][1] == row - 1 and ranges[-1][2:] == span:
+            ranges[-1] = (ranges[-1][0], row, *span)
+        else:
+            ranges.append((row, row, *span))
+    return ranges
+
+def sync_to_gsheet(worksheet, dataframe, state_path, chunk_cells=50_000, max_retries=5):
+    """
+    Incrementally sync `dataframe` (header + rows) to `worksheet`, writing only the cells that changed since the last sync.
+
+    A fingerprint of every cell written is kept in `state_path` (.npy). Each run compares the new cells with it and
+    sends the changed, added and removed row ranges through batched `values.batchUpdate` calls of at most
+    `chunk_cells` cells. Trailing removed rows and columns are dropped by resizing the sheet. The sheet is never cleared,
+    so the dashboard keeps showing data during the update. Quota (429) and 5xx errors are retried.
+
+    The saving depends on the data: only rows that are unchanged (and in the same position) are skipped, so a frame
+    with a column that changes on every row each run (e.g. a snapshot value repeated over the history) is rewritten in
+    full every time. Without a state file, or after a column change, every cell is rewritten once. Edits made by hand in the synced
+    range are not detected: delete the state file (or use write_to_gsheet with sync=False) to force a full rewrite.
+
+    Returns the number of cells written.
+    """
+    from gspread.utils import rowcol_to_a1, absolute_range_name
+
+    rows, fingerprints = _gsheet_cells(dataframe)
+    previous = np.load(state_path) if os.path.exists(state_path) else None
+    ranges = _changed_ranges(fingerprints, previous)
+
+    # Forget the state until the sync completes, so a partly applied sync is followed by a full rewrite
+    if previous is not None:
+        os.remove(state_path)
+
+    n_rows, n_cols = fingerprints.shape
+    if (worksheet.row_count, worksheet.col_count) != (n_rows, n_cols):
+        _gsheet_call(worksheet.resize, rows=n_rows, cols=n_cols, max_retries=max_retries)
+
+    # Split the rectangles into row blocks of at most `chunk_cells` cells, then pack them into batchUpdate requests
+    blocks = []
+    for first_row, last_row, first_col, last_col in ranges:
+        rows_per_block = max(1, chunk_cells // (last_col - first_col + 1))
+        for start in range(first_row, last_row + 1, rows_per_block):
+            end = min(last_row, start + rows_per_block - 1)
+            blocks.append({
+                'range': absolute_range_name(worksheet.title, f'{rowcol_to_a1(start + 1, first_col + 1)}:{rowcol_to_a1(end + 1, last_col + 1)}'),
+                'values': [row[first_col:last_col + 1] for row in rows[start:end + 1]],
+            })
+
+    batch, batch_cells, requests_sent, cells_written = [], 0, 0, 0
+    for block in blocks + [None]:
+        block_cells = len(block['values']) * len(block['values'][0]) if block else 0
+        if batch and (block is None or batch_cells + block_cells > chunk_cells):
+            _gsheet_call(worksheet.spreadsheet.values_batch_update,
+                         {'valueInputOption': 'USER_ENTERED', 'data': batch}, max_retries=max_retries)
+            requests_sent += 1
+            cells_written += batch_cells
+            batch, batch_cells = [], 0
+        if block:
+            batch.append(block)
+            batch_cells += block_cells
+
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with atomic_path(state_path, suffix='.tmp.npy') as tmp_path:
+        np.save(tmp_path, fingerprints)
+
+    print(f"Sheet sync : {cells_written} of {n_rows * n_cols} cells written in {len(ranges)} ranges, {requests_sent} requests")
+    return cells_written
+
+def write_to_gsheet(dataframe, spreadsheet_id, worksheet_id, gs_client, clear_old_data=True, new_title=None,
+                    sync=False, state_dir=DEFAULT_GSHEET_STATE_DIR, chunk_cells=50_000, max_retries=5):
     """
     Uploads a DataFrame to a specified Google Sheets worksheet by worksheet ID and optionally renames it.
 
     Parameters:
     dataframe (pd.DataFrame): The DataFrame to upload.
     spreadsheet_id (str): The ID of the Google Sheets document.
-    worksheet_id (int): The ID of the worksheet to upload the data to.
+    worksheet_id (int): The ID of the worksheet to upload the data to. None to use the worksheet titled `new_title`,
+        which is added to the document if it does not exist yet.
     gs_client (gspread.Client): The authorized gspread client.
     new_title (str, optional): The new title to rename the worksheet. Defaults to None.
+    sync (bool, optional): Write only the cells changed since the last sync (see sync_to_gsheet) instead of clearing
+        and re-uploading the whole sheet; `clear_old_data` is ignored. Defaults to False.
+    state_dir (str, optional): Directory of the per-worksheet sync fingerprints. Defaults to DEFAULT_GSHEET_STATE_DIR.
+    chunk_cells / max_retries (int, optional): Maximum cells per batchUpdate request / retries on quota errors (sync only).
     """
+    from gspread_dataframe import set_with_dataframe
+
     # Open the Google Sheets document by ID
     spreadsheet = gs_client.open_by_key(spreadsheet_id)
     
-    # Find the worksheet by ID
-    worksheet = next((sheet for sheet in spreadsheet.worksheets() if sheet.id == worksheet_id), None)
-    if worksheet is None:
-        raise ValueError(f"No worksheet found with ID: {worksheet_id}")
-    
-    # Rename the worksheet if a new title is provided
-    if new_title:
-        worksheet.update_title(new_title)
+    if worksheet_id is None:
+        # Find the worksheet by title, or add it
+        if not new_title:
+            raise ValueError("Either worksheet_id or new_title is required.")
+        worksheet = next((sheet for sheet in spreadsheet.worksheets() if sheet.title == new_title), None)
+        if worksheet is None:
+            worksheet = spreadsheet.add_worksheet(title=new_title, rows=len(dataframe) + 1, cols=len(dataframe.columns))
+        worksheet_id = worksheet.id
+    else:
+        # Find the worksheet by ID
+        worksheet = next((sheet for sheet in spreadsheet.worksheets() if sheet.id == worksheet_id), None)
+        if worksheet is None:
+            raise ValueError(f"No worksheet found with ID: {worksheet_id}")
+
+        # Rename the worksheet if a new title is provided
+        if new_title:
+            worksheet.update_title(new_title)
     
+    state_path = os.path.join(state_dir, f'{spreadsheet_id}_{worksheet_id}.npy')
+    if sync:
+        sync_to_gsheet(worksheet, dataframe, state_path, chunk_cells=chunk_cells, max_retries=max_retries)
+        print(f"DataFrame synced successfully to worksheet ID {worksheet_id} in the Google Sheets document.")
+        return
+
+    # The sheet no longer matches the sync fingerprints, the next sync rewrites it in full
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
     # Clear existing content in the worksheet (optional)
     if clear_old_data:
         worksheet.clear()
@@ -202,12 +517,17 @@ def authenticate_google_sa(api_name, api_version, scopes):
     Returns:
         googleapiclient.discovery.Resource: The authenticated API service object.
     """
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+
     credentials = Credentials.from_service_account_info(service_account_bi, scopes=scopes)
     return build(api_name, api_version, credentials=credentials)
 
 # TIMESTAMP
 
 def get_local_time():
+    import tzlocal
+
     local_timezone = tzlocal.get_localzone()
     current_time = datetime.now(local_timezone)
     timezone_name = local_timezone.key
@@ -259,6 +579,27 @@ def convert_unix(ori_format, value, unix_output_format='milliseconds'):
     else:
         raise ValueError("ori_format argument must be either 'unix' or 'human_date'.")
 
+# ATOMIC FILE WRITE
+
+@contextmanager
+def atomic_path(path, suffix='.tmp'):
+    """
+    Yield a temporary path next to `path` to write the new file to, then move it over `path` in one step once the block
+    succeeds, so readers see either the old or the new file, never a partial one. On error the temporary file is removed
+    and `path` is left untouched.
+
+    Parameters:
+    - path (str): Final file location.
+    - suffix (str): Appended to `path` for the temporary file, e.g. '.tmp.npy' for np.save, which adds '.npy' otherwise.
+    """
+    tmp_path = f'{path}{suffix}'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 # SAFE DIVIDE
     
 def safe_divide_optimized(numerator, denominator): # example : df['result'] = safe_divide_optimized(df['num'],df['denom'])
@@ -270,6 +611,8 @@ def safe_divide_optimized(numerator, denominator): # example : df['result'] = sa
 # FIX BROKEN EXCEL
 
 def fix_broken_excel(list_of_path, num_files=1):
+    from openpyxl import load_workbook
+
     libreoffice_command = "soffice" if platform.system() == "Windows" else "libreoffice"
     input_folders = list_of_path
 
@@ -380,45 +723,249 @@ def get_latest_file_multiple_folder(local_path_list, n=1):
 
 # LOG FUNCTION
 
-def log_function(script_function_list):
+PROFILE_MODES = ['cprofile', 'tracemalloc', 'sampling']
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.profiles')
+
+def _peak_rss():
+    # Peak resident memory of the process in bytes (None where the resource module is unavailable, e.g. Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+class _StackSampler:
+    # Wall-clock sampling profiler: snapshots the stack of every thread with sys._current_frames() at a fixed interval
+    # and counts the collapsed stacks (flamegraph.pl / speedscope "folded" format).
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f'{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                key = ';'.join([names.get(thread_id, str(thread_id))] + stack[::-1])
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(f'{stack} {count}\n')
+
+def _run_profiled(report_function, kwargs, profile, artifact_path):
+    # Run the task under the chosen profiler, write its artifact and return the traced peak memory (tracemalloc only)
+    if profile is None:
+        report_function(**kwargs)  # Unpack the dictionary as keyword arguments
+        return None
+
+    os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+
+    if profile == 'cprofile':
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(report_function, **kwargs)
+        finally:
+            profiler.dump_stats(f'{artifact_path}.pstats')  # python -m pstats <file> / snakeviz <file>
+        return None
 
-    start_time = time.time()
-    print("\033[94m" + "="*50 + "\033[0m")  # Blue color border line
-    print("\033[93m" + "        🚀  STARTING SCRIPT EXECUTION  🚀" + "\033[0m")  # Yellow bold header with rocket emoji
-    print("\033[94m" + "="*50 + "\033[0m")  # Blue color border line
+    if profile == 'tracemalloc':
+        import tracemalloc
 
-    def load_report(report_function, kwargs):
-        func_start_time = time.time()  # Start time for individual function
+        tracemalloc.start(10)
         try:
-            report_function(**kwargs)  # Unpack the dictionary as keyword arguments
-            print(f'\033[92mLoad {report_function.__name__} successful\033[0m')  # Green text for success
-            func_time_taken_sec = round(time.time() - func_start_time, 2)
-            func_time_taken_min = round((time.time() - func_start_time)/60,2)
-            print(f'\033[93mTime taken for {report_function.__name__}: {func_time_taken_sec} seconds ({func_time_taken_min} minutes)\033[0m')  # Yellow text for time taken
-            return True
-        except Exception as e:
-            func_time_taken_sec = round(time.time() - func_start_time, 2)
-            func_time_taken_min = round((time.time() - func_start_time)/60,2)
-            print(f"\033[91mAn error occurred with {report_function.__name__}: {e}\033[0m")  # Red text for error
-            print(f'\033[93mTime taken for {report_function.__name__}: {func_time_taken_sec} seconds ({func_time_taken_min} minutes) - ERROR\033[0m')  # Yellow text for time taken in case of error
-            return str(e)
+            report_function(**kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            with open(f'{artifact_path}.tracemalloc.txt', 'w') as f:
+                f.write(f'Peak traced memory: {traced_peak / 1e6:.1f} MB\n\nLargest live allocations at the end of the task:\n')
+                for stat in snapshot.statistics('traceback')[:25]:
+                    f.write(f'\n{stat.size / 1e6:.2f} MB in {stat.count} blocks\n')
+                    f.write('\n'.join(stat.traceback.format()) + '\n')
+        return traced_peak
+
+    if profile == 'sampling':
+        sampler = _StackSampler()
+        try:
+            with sampler:
+                report_function(**kwargs)
+        finally:
+            sampler.dump(f'{artifact_path}.folded')  # flamegraph.pl <file> or https://www.speedscope.app
+        return None
+
+    raise ValueError(f'The options for profile are None or {PROFILE_MODES}.')
+
+def _load_report(report_function, kwargs, profile=None, artifact_path=None):
+    func_start_time = time.time()  # Start time for individual function
+    traced_peak = None
+    try:
+        traced_peak = _run_profiled(report_function, kwargs, profile, artifact_path)
+        print(f'\033[92mLoad {report_function.__name__} successful\033[0m')  # Green text for success
+        func_time_taken_sec = round(time.time() - func_start_time, 2)
+        func_time_taken_min = round((time.time() - func_start_time)/60,2)
+        print(f'\033[93mTime taken for {report_function.__name__}: {func_time_taken_sec} seconds ({func_time_taken_min} minutes)\033[0m')  # Yellow text for time taken
+        result = True
+    except Exception as e:
+        func_time_taken_sec = round(time.time() - func_start_time, 2)
+        func_time_taken_min = round((time.time() - func_start_time)/60,2)
+        print(f"\033[91mAn error occurred with {report_function.__name__}: {e}\033[0m")  # Red text for error
+        print(f'\033[93mTime taken for {report_function.__name__}: {func_time_taken_sec} seconds ({func_time_taken_min} minutes) - ERROR\033[0m')  # Yellow text for time taken in case of error
+        result = str(e)
+
+    if profile is not None:
+        peak_rss = _peak_rss()
+        memory = [f'traced peak {traced_peak / 1e6:.1f} MB' if traced_peak is not None else None,
+                  f'process peak RSS {peak_rss / 1e6:.1f} MB' if peak_rss is not None else None]
+        print(f'\033[93mPeak memory for {report_function.__name__}: {", ".join(m for m in memory if m) or "n/a"} - profile : {artifact_path}.*\033[0m')
+
+    return result, func_time_taken_sec
+
+def _resolve_dependencies(script_function_list):
+    # Map every task to the indices of its upstream tasks (given as functions or function names), then check for cycles
+    dependencies = []
+    for idx, task in enumerate(script_function_list):
+        upstream = set()
+        for dep in (task[2] if len(task) > 2 else None) or []:
+            matches = [i for i, other in enumerate(script_function_list)
+                       if i != idx and (other[0] is dep or other[0].__name__ == dep)]
+            if not matches:
+                raise ValueError(f"Unknown dependency {getattr(dep, '__name__', dep)} for {task[0].__name__}.")
+            upstream.update(matches)
+        dependencies.append(upstream)
+
+    resolved = set()
+    while len(resolved) < len(dependencies):
+        ready = [idx for idx, upstream in enumerate(dependencies) if idx not in resolved and upstream <= resolved]
+        if not ready:
+            raise ValueError("The task dependencies contain a cycle.")
+        resolved.update(ready)
+
+    return dependencies
+
+def _critical_path(dependencies, durations):
+    # Longest chain of task durations through the dependency graph
+    finish, previous = {}, {}
+
+    def finish_time(idx):
+        if idx not in finish:
+            upstream = max(dependencies[idx], key=finish_time, default=None)
+            previous[idx] = upstream
+            finish[idx] = durations.get(idx, 0) + (finish_time(upstream) if upstream is not None else 0)
+        return finish[idx]
+
+    last = max(range(len(dependencies)), key=finish_time)
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[last]
+    return path[::-1], finish[path[0]]
+
+def log_function(script_function_list, max_workers=1, executor='thread', profile=None, profile_dir=DEFAULT_PROFILE_DIR):
 
-    count = 1
-    error_script = []
+    """
+    Parameters:
+    script_function_list : list of (function, kwargs) or (function, kwargs, depends_on) tuples
+        depends_on : list of upstream tasks (functions or function names). The task starts once all of them succeeded
+                     and is skipped if any of them failed or was skipped.
+    max_workers : number of tasks running at the same time. 1 (default) runs the tasks one by one in list order
+    executor : 'thread' or 'process' (functions and kwargs must then be picklable)
+    profile : None (default) or one of PROFILE_MODES, to profile every task and write one artifact per task to profile_dir
+        - cprofile : deterministic profile of the task's thread (.pstats, open with `python -m pstats` or snakeviz)
+        - tracemalloc : peak traced memory and the largest allocations (.tracemalloc.txt)
+        - sampling : low-overhead wall-clock stack samples of every thread, e.g. fetch workers (.folded, for flamegraphs)
+        The peak memory of each task is printed next to its timing. With max_workers > 1 and threads, tracemalloc and
+        sampling also see the other tasks running at the same time.
+    profile_dir : directory of the profile artifacts. Default: DEFAULT_PROFILE_DIR (`.profiles/`)
+    """
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    if executor not in ('thread', 'process'):
+        raise ValueError('The options for executor are "thread" or "process".')
+    if profile is not None and profile not in PROFILE_MODES:
+        raise ValueError(f'The options for profile are None or {PROFILE_MODES}.')
 
-    for report_function, params in script_function_list: # Loop through the list and call the load_report function with parameters
+    dependencies = _resolve_dependencies(script_function_list)
 
-        script_name = f'SCRIPT {count} : {report_function.__name__}'
+    start_time = time.time()
+    print("\033[94m" + "="*50 + "\033[0m")  # Blue color border line
+    print("\033[93m" + "        🚀  STARTING SCRIPT EXECUTION  🚀" + "\033[0m")  # Yellow bold header with rocket emoji
+    print("\033[94m" + "="*50 + "\033[0m")  # Blue color border line
 
-        print(f'\033[94m*********************************** {script_name} ***********************************\033[0m')  # Blue text for script names
-        result = load_report(report_function, params)
-        print()
-        print()
+    script_names = [f'SCRIPT {idx + 1} : {task[0].__name__}' for idx, task in enumerate(script_function_list)]
+    status = {}
+    durations = {}
+    error_script = []
 
-        if result is not True:
-            error_script.append(f'{script_name}: {result}')
-            
-        count += 1
+    pending = list(range(len(script_function_list)))
+    running = {}
+
+    pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+    with pool_class(max_workers=max_workers) as pool:
+        while pending or running:
+
+            # Skip the tasks with a failed or skipped upstream task
+            skipped = True
+            while skipped:
+                skipped = False
+                for idx in list(pending):
+                    failed = [script_function_list[d][0].__name__ for d in dependencies[idx] if status.get(d) in ('error', 'skipped')]
+                    if failed:
+                        pending.remove(idx)
+                        status[idx] = 'skipped'
+                        skipped = True
+                        print(f'\033[91mSkipped {script_names[idx]} (upstream failed: {", ".join(failed)})\033[0m')
+                        error_script.append(f'{script_names[idx]}: skipped, upstream failed ({", ".join(failed)})')
+
+            # Start the tasks whose upstream tasks all succeeded (in list order)
+            for idx in list(pending):
+                if len(running) >= max_workers:
+                    break
+                if all(status.get(d) == 'success' for d in dependencies[idx]):
+                    pending.remove(idx)
+                    report_function, params = script_function_list[idx][:2]
+                    print(f'\033[94m*********************************** {script_names[idx]} ***********************************\033[0m')  # Blue text for script names
+                    artifact_path = os.path.join(profile_dir, f'{datetime.now():%Y%m%d_%H%M%S}_{idx + 1}_{report_function.__name__}')
+                    running[pool.submit(_load_report, report_function, params, profile, artifact_path)] = idx
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = running.pop(future)
+                result, durations[idx] = future.result()
+                print()
+                print()
+
+                if result is True:
+                    status[idx] = 'success'
+                else:
+                    status[idx] = 'error'
+                    error_script.append(f'{script_names[idx]}: {result}')
 
     # Print the error scripts
     if error_script:
@@ -428,6 +975,14 @@ def log_function(script_function_list):
     else:
         print("\n\033[92mAll scripts ran successfully.\033[0m")  # Green text for success message
 
+    # Critical path : the chain of dependent tasks that bounds the total time
+    if durations:
+        path, path_time = _critical_path(dependencies, durations)
+        print(f'\033[93mCritical Path : {" -> ".join(f"{script_function_list[idx][0].__name__} ({durations.get(idx, 0)} s)" for idx in path)} = {round(path_time, 2)} seconds\033[0m')
+        print(f'\033[93mSum of Task Times : {round(sum(durations.values()), 2)} seconds\033[0m')
+    if profile is not None and _peak_rss() is not None:
+        print(f'\033[93mPeak Process Memory (RSS) : {_peak_rss() / 1e6:.1f} MB\033[0m')
+
     print("")
     get_local_time()
 
@@ -444,7 +999,7 @@ def log_function(script_function_list):
 
 # function_list = [
 #     (get_product_master_list, {}),
-#     (get_latest_inv_status, {}),
+#     (get_latest_inv_status, {}, [get_product_master_list]),  # optional 3rd item : upstream tasks
 #     
 #     (get_daily_inv_brand, {}),
 #     (get_monthly_inv, {'report_scope': 'full'}),
@@ -458,7 +1013,7 @@ def log_function(script_function_list):
 #     (sku_weekly_pivot_ytd, {})
 # ]
 
-# log_function(function_list)
+# log_function(function_list, max_workers=4)
 
 def flexible_categorize_by_description(description, dict_mapping, type='simple', match_type='strict'):
     """
@@ -1,125 +1,291 @@
 import pandas as pd
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 import numpy as np
 import os
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from fetch_data.cg_fetch_coins_market_chart_range import cg_fetch_coins_market_chart_range
-from fetch_data.cg_fetch_coins_market_chart import cg_fetch_coins_market_chart
-from fetch_data.cg_fetch_coins_markets import cg_fetch_coins_markets
-from fetch_data.cg_fetch_coins_ohlc import cg_fetch_coins_ohlc, ohlc_day_options
+from fetch_data.cg_fetch_coins_ohlc import cg_fetch_coins_ohlc, ohlc_days_for
 from fetch_data.cg_fetch_search_trending import cg_fetch_search_trending
 from fetch_data.cg_fetch_simple_price import cg_fetch_simple_price
-
-from bi_function import write_table_by_unique_id, get_local_time, log_function, read_from_gbq, BI_CLIENT, BI_PROJECT_ID
+from fetch_data.cg_cache import ResponseCache, DEFAULT_CACHE_PATH
+from fetch_data.cg_checkpoint import CheckpointStore, DEFAULT_CHECKPOINT_PATH
+from fetch_data.cg_client import configure_client
+from fetch_data.cg_fetch_engine import fetch_concurrent
+from fetch_data.cg_metrics import reset_metrics, DEFAULT_METRICS_PATH
+from fetch_data.cg_request_planner import RequestPlanner
+from fetch_data.cg_rate_limiter import AdaptiveRateLimiter
+from fetch_data.cg_watermark import WatermarkStore, DEFAULT_WATERMARK_PATH
+
+from bi_function import get_local_time, log_function
+from bi_backend import get_backend
+from cg_schema import HISTORY_COLUMNS
 
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def cg_data_a_merge_init(cg_apikey,currency = 'usd',decimal_precision = '6',last_x_days = 365, delay_between_request = 3):
+# 'wide' : one table with the coin snapshot and trending columns repeated on every (coin_id, date) history row
+# 'star' : a narrow daily fact table plus per-run coin snapshot and trending dimensions, joined at query time
+OUTPUT_MODES = ['wide', 'star']
+
+def cg_data_a_merge_init(cg_apikey,currency = 'usd',decimal_precision = '6',last_x_days = 365, delay_between_request = 3,
+                         calls_per_minute = None, max_in_flight = 5, cache_path = DEFAULT_CACHE_PATH,
+                         incremental = True, watermark_path = DEFAULT_WATERMARK_PATH, json_backend = 'auto', top_n = 100,
+                         backend = None, history_days = None, metrics_path = DEFAULT_METRICS_PATH, output_mode = 'wide',
+                         stream_chunk_size = None, resume = False, checkpoint_path = DEFAULT_CHECKPOINT_PATH,
+                         final_pause = 5):
+    """
+    Fetch CoinGecko market, trending, OHLC and market chart data and merge them into a single historical table.
+
+    Parameters:
+    - delay_between_request (float): Average seconds between API calls, used when `calls_per_minute` is not set.
+      0 (or less) sends the calls without any rate limit.
+    - calls_per_minute (float): Allowed API calls per minute for the plan in use. Shared by all concurrent requests and
+      lowered automatically (then ramped back up) when CoinGecko answers with HTTP 429.
+    - max_in_flight (int): Maximum number of concurrent per-coin requests.
+    - cache_path (str): SQLite file for the on-disk API response cache, so re-runs and backfills on the same day are
+      served locally. Set to None to always call the API.
+    - incremental (bool): Only fetch the days after each coin's last date loaded from both the market chart and OHLC
+      endpoints (its watermark). Coins without a watermark get the full `last_x_days` window. Set to False to refresh the
+      full window for every coin.
+    - watermark_path (str): SQLite file holding the per-coin watermarks.
+    - json_backend (str): JSON decoder used by the fetch client ('auto', 'orjson', 'simdjson' or 'stdlib').
+    - top_n (int): Size of the tracked coin universe (top coins by market cap), fetched in pages of 250.
+    - backend (WarehouseBackend / str): Storage backend instance or name ('bigquery', 'duckdb').
+      Default: bi_backend.get_backend() (the BI_BACKEND environment variable, then BigQuery).
+    - history_days (int): Only carry the last `history_days` days of history into cgc_a_market_historical_data.
+      Default: None (the full history).
+    - metrics_path (str): Write the per-request API metrics and stage timers of the run to this file, as Prometheus
+      text if it ends with '.prom', as JSON otherwise. Default: DEFAULT_METRICS_PATH (`.profiles/cg_metrics.json`,
+      overwritten by every run). Set to None to only print the per-endpoint summary.
+    - output_mode (str): 'wide' (default) builds cgc_a_market_historical_data, with the snapshot columns copied onto
+      every history row. 'star' writes cgc_fact_market_daily (HISTORY_COLUMNS only), cgc_dim_coin_snapshot (one row
+      per coin, with `trending_flag`) and cgc_dim_trending instead, so each snapshot is stored once rather than once
+      per day of history. Run cg_data_c_processed with the same `output_mode`.
+    - stream_chunk_size (int): Stream the per-coin OHLC and market chart data through fetch, merge and write in chunks
+      of this many coins, upserting each chunk to the warehouse (and advancing its watermarks) before the next one is
+      fetched, so memory stays flat as the coin universe grows. Default: None (all coins fetched, merged and written
+      together).
+    - resume (bool): Reuse the fetch units (endpoint, coin, window) completed by an earlier run of the same day that
+      failed, e.g. on a warehouse write error, and only fetch the remaining ones. Default: False (fresh run).
+    - checkpoint_path (str): SQLite file where every completed fetch unit is stored until the run succeeds.
+      Set to None to disable checkpoints (and resuming).
+    - final_pause (float): Seconds to wait after the run before returning. Default: 5. Set to 0 in benchmarks.
+    """
+
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"The options for output_mode are {OUTPUT_MODES}.")
 
     to_date = datetime.now().strftime('%Y-%m-%d')
     from_date = (pd.to_datetime(to_date) - pd.Timedelta(days=last_x_days-1)).strftime('%Y-%m-%d')
 
-    def fetch_loop(ref,coin_list):
-        print(f"\033[1;32m🛠️ Process : {ref}\033[0m")
-        print(f"Total coin to fetch : {len(coin_list)}")
+    if backend is None or isinstance(backend, str):
+        backend = get_backend(backend)
 
-        all_data = []
-        count = 1
+    if resume and not checkpoint_path:
+        raise ValueError("resume requires a checkpoint_path.")
 
-        for coin in coin_list:
-            try:
-                print(f"{count}. Fetching {ref} data for {coin}...")
-
-                if ref == 'ohlc':
-                    possible_days_value = max([num for num in ohlc_day_options if num <= last_x_days])
-                    data = cg_fetch_coins_ohlc(cg_apikey,id=coin,vs_currency=currency,days=str(possible_days_value),precision=decimal_precision)
-                
-                elif ref == 'market_chart':
-                    data = cg_fetch_coins_market_chart(cg_apikey,id=coin,vs_currency=currency,days=str(last_x_days),interval='daily',
-                                                    precision=decimal_precision)
-                
-                elif ref == 'market_chart_range':
-                    data = cg_fetch_coins_market_chart_range(cg_apikey,id=coin,from_date=from_date,to_date=to_date,
-                                                            vs_currency=currency,precision=decimal_precision,interval='')
-
-                all_data.append(data)
-                count += 1
-                time.sleep(delay_between_request)
+    metrics = reset_metrics()
 
-            except Exception as e:
-                print(f"\033[1;31mError fetching {ref} data for {coin}: {e}\033[0m")
+    # *** Checkpoints ***
+    # Units are only reused by a run for the same day, currency, precision and window
+    checkpoints = CheckpointStore(f'{to_date}|{currency}|{decimal_precision}|{last_x_days}', checkpoint_path, resume=resume) if checkpoint_path else None
+    if resume:
+        print(f"Resuming : {len(checkpoints)} completed fetch units found")
+
+    if calls_per_minute:
+        rate_limiter = AdaptiveRateLimiter(calls_per_minute)
+    elif delay_between_request > 0:
+        rate_limiter = AdaptiveRateLimiter(60 / delay_between_request)
+    else:
+        rate_limiter = None # No delay between requests, 429s are still retried by the client
+    cache = ResponseCache(cache_path) if cache_path else None
+    configure_client(cg_apikey, pool_size=max_in_flight, rate_limiter=rate_limiter, cache=cache, json_backend=json_backend)
 
-        df = pd.concat(all_data, ignore_index=True)
+    def fetch_loop(ref,coin_list):
+        print(f"\033[1;32m🛠️ Process : {ref}\033[0m")
+        print(f"Total coin to fetch : {len(coin_list)}")
+
+        def fetch_coin(coin):
+            coin_days = days_needed(coin)
+
+            if checkpoints is not None:
+                data = checkpoints.get(ref, coin, coin_days)
+                if data is not None:
+                    return data
+
+            if ref == 'ohlc':
+                possible_days_value = ohlc_days_for(coin_days, last_x_days)
+                data = cg_fetch_coins_ohlc(cg_apikey,id=coin,vs_currency=currency,days=str(possible_days_value),precision=decimal_precision)
+            
+            elif ref == 'market_chart':
+                data = planner.market_chart(coin, coin_days)
+            
+            elif ref == 'market_chart_range':
+                coin_from_date = (pd.to_datetime(to_date) - pd.Timedelta(days=coin_days-1)).strftime('%Y-%m-%d')
+                data = planner.market_chart_range(coin, coin_from_date, to_date)
+
+            # Keep only the days from the watermark onwards (the watermark day itself is reloaded in case it was provisional)
+            if coin in watermarks and not data.empty:
+                data = data[data['date'] >= watermarks[coin].normalize()]
+
+            # The cg_fetch_* functions return an empty frame on a failed request, so only units with data count as completed
+            if checkpoints is not None and not data.empty:
+                checkpoints.put(ref, coin, coin_days, data)
+
+            return data
+
+        count = 0
+
+        def report_progress(coin, data, error):
+            nonlocal count
+            count += 1
+            if error is not None:
+                print(f"\033[1;31mError fetching {ref} data for {coin}: {error}\033[0m")
+            else:
+                print(f"{count}. Fetched {ref} data for {coin}")
+
+        with metrics.timer(f'stage: fetch {ref}'):
+            results = fetch_concurrent(fetch_coin, coin_list, max_in_flight=max_in_flight, on_complete=report_progress)
+        all_data = [data for _, data, error in results if error is None and not data.empty]
+
+        df = pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
         print("------------------------------")
 
         return df
 
 
+    # *** Request Planner ***
+    # All markets needs of the run (top coins, trending coins, coins already in the history table) are declared first
+    # and fetched once; market chart windows are merged per coin so both chart paths share one call.
+    planner = RequestPlanner(cg_apikey, vs_currency=currency, precision=decimal_precision, max_in_flight=max_in_flight,
+                             order='market_cap_desc', sparkline=False, price_change_percentage='1h,24h,7d,14d,30d,200d,1y',
+                             locale='en')
+
     # 1. COINS MARKET
-    df_markets = cg_fetch_coins_markets(cg_apikey, vs_currency=currency, ids=None, order='market_cap_desc', 
-                            per_page=100, page=1, sparkline=False, price_change_percentage='1h,24h,7d,14d,30d,200d,1y', 
-                            locale='en', precision=decimal_precision)
-    market_ids = df_markets['coin_id'].unique().tolist() #Get unique coin IDs
+    planner.need_markets(top_n=top_n)
 
     # 2. SEARCH TRENDING
     df_trending = cg_fetch_search_trending(cg_apikey)
     trending_ids = df_trending['coin_id'].unique().tolist() #Get unique coin IDs
-    not_exist_trending_ids = [id for id in trending_ids if id not in market_ids] # Find coin IDs that do not exist in df_markets
-
-    df_markets_additional_1 = cg_fetch_coins_markets(cg_apikey, vs_currency=currency, ids=not_exist_trending_ids, order='market_cap_desc', 
-                            per_page=100, page=1, sparkline=False, price_change_percentage='1h,24h,7d,14d,30d,200d,1y', 
-                            locale='en', precision=decimal_precision) # Fetch non-exist trending coin IDs
-
-    df_market_all_1 = pd.concat([df_markets,df_markets_additional_1]).reset_index(drop=True)
-    market_all_ids = df_market_all_1['coin_id'].unique().tolist() #Get unique coin IDs
+    planner.need_markets(ids=trending_ids)
+
+    # Coins already in the history table, they still need a current market snapshot for the final merge
+    try:
+        query_market_chart_ohlc_his_ids = f'''SELECT DISTINCT coin_id FROM {backend.table_ref('data_stage.cgc_market_chart_ohlc')}'''
+        market_chart_ohlc_his_ids = backend.read(query_market_chart_ohlc_his_ids)['coin_id'].tolist()
+    except Exception as e:
+        print(f"\033[1;31mCould not read history coin IDs, continuing without them: {e}\033[0m")
+        market_chart_ohlc_his_ids = []
+    planner.need_markets(ids=market_chart_ohlc_his_ids)
+
+    with metrics.timer('stage: fetch markets'):
+        df_markets = planner.markets(top_n=top_n)
+    df_market_all_1 = planner.markets(top_n=top_n, ids=trending_ids)
+    df_market_all_2 = planner.markets()
 
     df_trending_drop = df_trending.drop(columns=['coin_symbol', 'coin_name']) #Handle for later merging
 
     # *** Create Coin List ***
     coin_list = df_market_all_1['coin_id'].unique().tolist()
 
-    # # 3. SIMPLE PRICE
-    # df_simple = cg_fetch_simple_price(cg_apikey,ids=",".join(coin_list))
-    # # `cg_fetch_coins_markets` provides data similar to `cg_fetch_simple_price`.
-    # # The only difference is that 'usd_24h_vol' is missing in `cg_fetch_coins_markets`.
-    # # However, `cg_fetch_coins_markets` is more comprehensive and contains more detailed data.
-    # # Therefore, for this task, we will use `cg_fetch_coins_markets`.
+    # *** Incremental Window (Watermarks) ***
+    watermarks = {}
+    if incremental:
+        watermark_store = WatermarkStore(watermark_path)
 
-    # 4. COINS OHLC
-    df_ohlc = fetch_loop('ohlc',coin_list)
+        if watermark_store.is_empty(currency): # First run on this machine, seed the watermarks from the warehouse
+            try:
+                # Last date with both market chart and OHLC data, so days whose OHLC is missing are fetched again
+                query_watermark = f'''SELECT coin_id, MAX(CASE WHEN ohlc_close IS NOT NULL THEN date END) AS last_date
+                                      FROM {backend.table_ref('data_stage.cgc_market_chart_ohlc')}
+                                      WHERE mkch_currency = '{currency}' GROUP BY coin_id'''
+                df_watermark = backend.read(query_watermark).dropna(subset=['last_date'])
+                watermark_store.update(dict(zip(df_watermark['coin_id'], df_watermark['last_date'])), currency)
+            except Exception as e:
+                print(f"\033[1;31mCould not seed watermarks from the warehouse, fetching the full window: {e}\033[0m")
 
-    # 5. COINS MARKET CHART
-    df_market_chart = fetch_loop('market_chart',coin_list)
+        watermarks = watermark_store.get_many(coin_list, currency)
 
-    # # 6. COINS MARKET CHART RANGE
-    # df_market_chart_range = fetch_loop('market_chart_range',coin_list)
-    # # `cg_fetch_coins_market_chart` provides same data to `cg_fetch_coins_market_chart_range`.
-    # # The only difference is the parameter used to fetch the data, but the result is exactly the same.
-    # # Therefore, we will comment it out for now, as we will conduct our analysis using `cg_fetch_coins_market_chart`.
+    today_utc = pd.Timestamp(datetime.now(timezone.utc).date())
 
-    # *** Merge Market Chart & OHLC Data ***
-    df_market_chart_ohlc = pd.merge(df_market_chart,df_ohlc,on=['coin_id','date'],how='left',indicator=True)
-    df_market_chart_ohlc = df_market_chart_ohlc.rename(columns={'_merge': 'merge_status_2'})
-    write_table_by_unique_id(df_market_chart_ohlc, 'data_stage.cgc_market_chart_ohlc', 'append', ['coin_id'], date_col_ref='date')
+    def days_needed(coin):
+        if coin not in watermarks:
+            return last_x_days
+        return max(1, min(last_x_days, (today_utc - watermarks[coin].normalize()).days + 1))
 
-    time.sleep(2)
+    print(f"Coins with watermark (incremental fetch) : {len(watermarks)} / {len(coin_list)}")
 
-    query_market_chart_ohlc_his = f'''SELECT * FROM `{BI_PROJECT_ID}.data_stage.cgc_market_chart_ohlc`'''
-    df_market_chart_ohlc_his = read_from_gbq(BI_CLIENT,query_market_chart_ohlc_his)
-    market_chart_ohlc_his_ids = df_market_chart_ohlc_his['coin_id'].unique().tolist() #Get unique coin IDs
+    for coin in coin_list:
+        planner.need_series(coin, days_needed(coin))
 
-    not_exist_market_chart_ohlc_his_ids = [id for id in market_chart_ohlc_his_ids if id not in market_all_ids] # Find coin IDs that do not exist in df_market_all_1
+    # # 3. SIMPLE PRICE
+    # df_simple = cg_fetch_simple_price(cg_apikey,ids=",".join(coin_list))
+    # # `cg_fetch_coins_markets` provides data similar to `cg_fetch_simple_price`.
+    # # The only difference is that 'usd_24h_vol' is missing in `cg_fetch_coins_markets`.
+    # # However, `cg_fetch_coins_markets` is more comprehensive and contains more detailed data.
+    # # Therefore, for this task, we will use `cg_fetch_coins_markets`.
 
-    df_markets_additional_2 = cg_fetch_coins_markets(cg_apikey, vs_currency=currency, ids=not_exist_market_chart_ohlc_his_ids, order='market_cap_desc', 
-                                                    per_page=100, page=1, sparkline=False, price_change_percentage='1h,24h,7d,14d,30d,200d,1y', 
-                                                    locale='en', precision=decimal_precision) # Fetch non-exist coin IDs
-    
-    df_market_all_2 = pd.concat([df_market_all_1,df_markets_additional_2]).reset_index(drop=True)
+    def fetch_history(coins):
+        # 4. COINS OHLC
+        df_ohlc = fetch_loop('ohlc',coins)
+
+        # 5. COINS MARKET CHART
+        df_market_chart = fetch_loop('market_chart',coins)
+        print(f"Market chart requests served : {planner.series_requests} with {planner.series_calls} API calls")
+
+        # # 6. COINS MARKET CHART RANGE
+        # df_market_chart_range = fetch_loop('market_chart_range',coins)
+        # # `cg_fetch_coins_market_chart` provides same data to `cg_fetch_coins_market_chart_range`.
+        # # The only difference is the parameter used to fetch the data, but the result is exactly the same.
+        # # Therefore, we will comment it out for now, as we will conduct our analysis using `cg_fetch_coins_market_chart`.
+
+        if df_ohlc.empty or df_market_chart.empty:
+            # Every request of one endpoint failed: nothing to merge, so only the data that came back is written and the
+            # watermarks stay where they are
+            print(f"\033[1;31mNo {'OHLC' if df_ohlc.empty else 'market chart'} data fetched, skipping the merged history write\033[0m")
+            history_write_list = [
+                (df_ohlc, 'cryptocurrency.cgc_coins_ohlc', 'upsert', ['coin_id'], 'date'),
+                (df_market_chart, 'cryptocurrency.cgc_coins_market_chart', 'upsert', ['coin_id'], 'date'),
+            ]
+            return [item for item in history_write_list if not item[0].empty], {}
+
+        # *** Merge Market Chart & OHLC Data ***
+        df_market_chart_ohlc = pd.merge(df_market_chart,df_ohlc,on=['coin_id','date'],how='left',indicator=True)
+        df_market_chart_ohlc = df_market_chart_ohlc.rename(columns={'_merge': 'merge_status_2'})
+
+        history_write_list = [
+            (df_ohlc, 'cryptocurrency.cgc_coins_ohlc', 'upsert', ['coin_id'], 'date'),
+            (df_market_chart, 'cryptocurrency.cgc_coins_market_chart', 'upsert', ['coin_id'], 'date'),
+            (df_market_chart_ohlc, 'data_stage.cgc_market_chart_ohlc', 'upsert', ['coin_id'], 'date'),
+        ]
+        # A coin's watermark only covers the days loaded from both endpoints: when its OHLC request failed (or lags behind
+        # the market chart) the missing days stay after the watermark and are fetched again on the next run
+        df_complete = df_market_chart_ohlc[df_market_chart_ohlc['merge_status_2'] == 'both']
+        last_dates = df_complete.groupby('coin_id')['date'].max().to_dict()
+
+        return history_write_list, last_dates
+
+    if stream_chunk_size:
+        # Each chunk is written (and its watermarks advanced) before the next one is fetched, only one chunk is ever in memory
+        chunks = [coin_list[i:i + stream_chunk_size] for i in range(0, len(coin_list), stream_chunk_size)]
+        for chunk_number, chunk in enumerate(chunks, start=1):
+            print(f"\033[1;32m🛠️ Chunk {chunk_number}/{len(chunks)} : {len(chunk)} coins\033[0m")
+            history_write_list, last_dates = fetch_history(chunk)
+            planner.release_series(chunk)
+
+            if history_write_list:
+                with metrics.timer('stage: write'):
+                    backend.write_tables(history_write_list, max_workers=max_in_flight)
+            if incremental:
+                watermark_store.update(last_dates, currency)
+            del history_write_list, last_dates
+
+        history_write_list, last_dates = [], {}
+    else:
+        history_write_list, last_dates = fetch_history(coin_list)
 
     # *** Merge Market & Trending Data ***
     df_current_market_trending = pd.merge(df_market_all_2,df_trending_drop,on='coin_id',how='left',indicator=True)
@@ -127,20 +293,71 @@ def cg_data_a_merge_init(cg_apikey,currency = 'usd',decimal_precision = '6',last
     df_current_market_trending['trending_flag'] = np.where(df_current_market_trending['merge_status_1'] == 'both',1,0)
 
     # *** Merge All ***
-    df_final = pd.merge(df_market_chart_ohlc_his,df_current_market_trending,on='coin_id',how='left',indicator=True)
-    df_final = df_final.rename(columns={'_merge': 'merge_status_3'})
-
-    # Load to BigQuery
-    write_table_by_unique_id(df_markets, 'cryptocurrency.cgc_coins_markets', 'replace', ['coin_id'], date_col_ref='date')
-    write_table_by_unique_id(df_trending, 'cryptocurrency.cgc_search_trending', 'replace', ['coin_id'], date_col_ref='date')
-    write_table_by_unique_id(df_ohlc, 'cryptocurrency.cgc_coins_ohlc', 'append', ['coin_id'], date_col_ref='date')
-    write_table_by_unique_id(df_market_chart, 'cryptocurrency.cgc_coins_market_chart', 'append', ['coin_id'], date_col_ref='date')
-
-    write_table_by_unique_id(df_final, 'cryptocurrency.cgc_a_market_historical_data', 'replace', ['coin_id'], date_col_ref='date')
+    # Joined inside the warehouse: the history table is never pulled into pandas, only the needed columns
+    # (and, with `history_days`, only the needed dates) are scanned. In star mode the join is left to the readers.
+    history_filter = f"history.mkch_currency = '{currency}'"
+    if history_days:
+        history_from_date = (pd.to_datetime(to_date) - pd.Timedelta(days=history_days-1)).strftime('%Y-%m-%d')
+        history_filter += f" AND CAST(history.date AS DATE) >= DATE '{history_from_date}'"
+
+    query_fact = f'''SELECT {", ".join(f"history.{col}" for col in HISTORY_COLUMNS)}
+                      FROM {backend.table_ref('data_stage.cgc_market_chart_ohlc')} AS history
+                      WHERE {history_filter}'''
+
+    snapshot_columns = [col for col in df_current_market_trending.columns if col != 'coin_id']
+    query_final = f'''SELECT {", ".join(f"history.{col}" for col in HISTORY_COLUMNS)},
+                              {", ".join(f"snapshot.{col}" for col in snapshot_columns)},
+                              CASE WHEN snapshot.coin_id IS NULL THEN 'left_only' ELSE 'both' END AS merge_status_3
+                       FROM {backend.table_ref('data_stage.cgc_market_chart_ohlc')} AS history
+                       LEFT JOIN {backend.table_ref('data_stage.cgc_current_market_trending')} AS snapshot
+                         ON history.coin_id = snapshot.coin_id
+                       WHERE {history_filter}'''
+
+    write_list = [
+        (df_markets, 'cryptocurrency.cgc_coins_markets', 'replace', ['coin_id'], 'date'),
+        (df_trending, 'cryptocurrency.cgc_search_trending', 'replace', ['coin_id'], 'date'),
+        *history_write_list,
+    ]
+
+    if output_mode == 'star':
+        df_dim_coin_snapshot = df_market_all_2.copy()
+        df_dim_coin_snapshot['trending_flag'] = np.where(df_dim_coin_snapshot['coin_id'].isin(df_trending_drop['coin_id']),1,0)
+        write_list += [
+            (df_dim_coin_snapshot, 'cryptocurrency.cgc_dim_coin_snapshot', 'replace', ['coin_id'], None),
+            (df_trending_drop, 'cryptocurrency.cgc_dim_trending', 'replace', ['coin_id'], None),
+        ]
+    else:
+        write_list.append((df_current_market_trending.astype({'merge_status_1': str}), 'data_stage.cgc_current_market_trending', 'replace', ['coin_id'], None))
+
+    # Load to Warehouse
+    # The tables are independent, so they are written concurrently; the historical (or fact) table is then built from the stage tables
+    with metrics.timer('stage: write'):
+        backend.write_tables(write_list, max_workers=max_in_flight)
+
+        if output_mode == 'star':
+            backend.create_table_as('cryptocurrency.cgc_fact_market_daily', query_fact)
+        else:
+            backend.create_table_as('cryptocurrency.cgc_a_market_historical_data', query_final)
+
+    # Advance the watermarks only once every table has been written
+    if incremental:
+        watermark_store.update(last_dates, currency)
+        watermark_store.close()
+
+    # The run completed, its checkpoints are no longer needed
+    if checkpoints is not None:
+        if resume:
+            print(f"Fetch units replayed from checkpoints : {checkpoints.replayed}")
+        checkpoints.clear()
+        checkpoints.close()
+
+    metrics.print_summary()
+    if metrics_path:
+        metrics.write(metrics_path)
 
     get_local_time()
 
-    time.sleep(5)
+    time.sleep(final_pause)
 
 if __name__ == "__main__":
 
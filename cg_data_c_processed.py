@@ -1,11 +1,67 @@
-from bi_function import read_from_gbq,BI_CLIENT,BI_PROJECT_ID,write_table_by_unique_id,write_to_gsheet,gs_client,log_function
-import numpy as np
-
-def cg_data_c_processed():
+from bi_function import write_to_gsheet,get_gs_client,log_function
+from bi_backend import get_backend
+from bi_extract import write_extract, DEFAULT_EXTRACT_DIR
+from cg_features import compute_features, features_sql, per_date_features
+from cg_schema import HISTORY_COLUMNS
+
+def split_snapshot(df):
+    """
+    Split the processed table into its history rows (HISTORY_COLUMNS plus the features that vary by date, e.g.
+    market_dominance) and one row per coin with the snapshot, trending and per-coin feature columns, to be joined back
+    on `coin_id`. The snapshot columns are the same on every date of a coin and change on every run, so keeping them
+    apart leaves most history cells of past days unchanged.
+    """
+    history_columns = HISTORY_COLUMNS + [col for col in per_date_features() if col in df.columns]
+
+    df_snapshot = df.sort_values(['date','coin_id'], kind='stable').drop_duplicates('coin_id', keep='last')
+    df_snapshot = df_snapshot.drop(columns=[col for col in history_columns if col != 'coin_id']).sort_values('coin_id', ignore_index=True)
+    return df[history_columns], df_snapshot
+
+def cg_data_c_processed(backend=None, write_gsheet=True, dtype_backend=None, output_mode='wide',
+                        features_in_warehouse=False, gsheet_sync=True, extract_formats=None,
+                        extract_dir=DEFAULT_EXTRACT_DIR, gsheet_split=True):
+    """
+    Parameters:
+    - backend (WarehouseBackend / str): Storage backend instance or name ('bigquery', 'duckdb'). Default: bi_backend.get_backend().
+    - write_gsheet (bool): Also publish the processed table to Google Sheets. Default: True.
+    - dtype_backend (str): None (NumPy dtypes) or 'pyarrow' to keep the wide read Arrow-backed, which uses less memory.
+      Default: None, as Google Sheets renders Arrow nulls as '<NA>' instead of empty cells.
+    - output_mode (str): Layout written by cg_data_a_merge_init. 'wide' (default) reads cgc_a_market_historical_data;
+      'star' joins cgc_fact_market_daily with the cgc_dim_coin_snapshot and cgc_dim_trending dimensions in the query.
+    - features_in_warehouse (bool): Compute the cg_features.FEATURES columns in the read query (compiled to SQL) instead
+      of in pandas. Default: False.
+    - gsheet_sync (bool): Only send the cells that changed since the last run to Google Sheets (bi_function.sync_to_gsheet)
+      instead of clearing and re-uploading the worksheet, which is then never left empty. Default: True.
+    - gsheet_split (bool): Publish two worksheets: the history rows (HISTORY_COLUMNS and the per-date features, which
+      only change for new or provisional days, so the sync only sends those) and one row per coin with the snapshot,
+      trending and per-coin feature columns in the 'cgc_a_market_snapshot_processed' worksheet (added if missing),
+      keyed by `coin_id`. Default: True. With False the single wide worksheet of earlier runs is kept, but the sync
+      gains nothing there: the snapshot ('cmrk_*', 'trdg_*') columns are repeated on every history row and change on
+      every run, so almost every cell is rewritten.
+    - extract_formats (list): Also write the processed table as a local extract for Tableau, 'parquet' and / or 'hyper'
+      (bi_extract.write_extract), split like `gsheet_split`: 'cgc_a_market_historical_processed' holds the history
+      columns and per-date features partitioned by date, so only new or provisional days are rewritten, and
+      'cgc_a_market_snapshot_processed' one row per coin, joined on `coin_id`. Default: None (no extract).
+    - extract_dir (str): Root directory of the extracts. Default: bi_extract.DEFAULT_EXTRACT_DIR (`.extract/`).
+    """
+
+    if backend is None or isinstance(backend, str):
+        backend = get_backend(backend)
+
+    if output_mode == 'wide':
+        source = backend.table_ref('cryptocurrency.cgc_a_market_historical_data')
+    elif output_mode == 'star':
+        source = f'''{backend.table_ref('cryptocurrency.cgc_fact_market_daily')}
+                     LEFT JOIN {backend.table_ref('cryptocurrency.cgc_dim_coin_snapshot')} USING (coin_id)
+                     LEFT JOIN {backend.table_ref('cryptocurrency.cgc_dim_trending')} USING (coin_id)'''
+    else:
+        raise ValueError('The options for output_mode are "wide" or "star".')
+
+    feature_columns = "".join(f",\n{' ' * 44}{expression}" for expression in features_sql()) if features_in_warehouse else ""
 
     # 1. Data Query
 
-    df = read_from_gbq(BI_CLIENT,f'''SELECT date,cmrk_data_ts as data_ts,cmrk_currency as currency,coin_id,coin_symbol,coin_name,
+    df = backend.read(f'''SELECT date,cmrk_data_ts as data_ts,cmrk_currency as currency,coin_id,coin_symbol,coin_name,
                                             mkch_price,mkch_market_cap,mkch_volume,
                                             ohlc_open,ohlc_high,ohlc_low,ohlc_close,
                                             cmrk_image,cmrk_current_price,cmrk_market_cap,cmrk_market_cap_rank,
@@ -19,8 +75,9 @@ def cg_data_c_processed():
                                             cmrk_price_change_percentage_30d_in_currency,cmrk_price_change_percentage_200d_in_currency,
                                             cmrk_price_change_percentage_1y_in_currency,
                                             trdg_img_thumb,trdg_img_small,trdg_img_large,trdg_score,trdg_sparkline,
-                                            trending_flag
-                                    FROM `{BI_PROJECT_ID}.cryptocurrency.cgc_a_market_historical_data`''')
+                                            trending_flag{feature_columns}
+                                    FROM {source}''',
+                      dtype_backend=dtype_backend)
     
     # 2. Handle Missing Value
 
@@ -37,37 +94,54 @@ def cg_data_c_processed():
     # These values are essential for analysis, so no imputation (mean, median, or forward filling) is applied.
 
     # 3. Feature Engineering - Snapshot Table ('cmrk_*')
+    # Declared in cg_features.FEATURES (market dominance per date, ratios, classifications), evaluated in one vectorized pass.
+    # Ratios with a zero denominator are left missing instead of infinite.
 
-    df['market_dominance'] = (df['cmrk_market_cap'] / df['cmrk_market_cap'].sum())
-    df['circulation_percentage'] = (df['cmrk_circulating_supply'] / df['cmrk_total_supply'])
-    df['price_change_classification'] = df['cmrk_price_change_percentage_24h_in_currency'].apply(lambda x: 'Bullish' if x > 0 else 'Bearish')
-    df['liquidity_score'] = df['cmrk_total_volume'] / df['cmrk_market_cap']
-    df['performance_trend_1y'] = df['cmrk_price_change_percentage_1y_in_currency'].apply(
-                                                                                        lambda x: 'High Growth' if x > 100 
-                                                                                        else 'Moderate' if 0 <= x <= 100 
-                                                                                        else 'Decline' if x < 0 
-                                                                                        else '-'
-                                                                                    )
-
-    # 4. Handle Infinity Value
+    if not features_in_warehouse:
+        df = compute_features(df)
 
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    # Write to Warehouse
+    backend.write(df, 'cryptocurrency.cgc_a_market_historical_processed', 'replace', ['coin_id'], date_col_ref='date')
 
-    # Write to BigQuery
-    write_table_by_unique_id(df, 'cryptocurrency.cgc_a_market_historical_processed', 'replace', ['coin_id'], date_col_ref='date')
+    # Write Local Extract
+    if extract_formats:
+        df_history, df_snapshot = split_snapshot(df)
+        write_extract(df_history, 'cgc_a_market_historical_processed', extract_dir=extract_dir, formats=extract_formats, sort_cols=['coin_id'])
+        write_extract(df_snapshot, 'cgc_a_market_snapshot_processed', extract_dir=extract_dir, formats=extract_formats,
+                      partition_col=None, sort_cols=['coin_id'])
+        del df_history, df_snapshot
 
     # Write to Google Sheets
+    if not write_gsheet:
+        return
+
     # Formatting Date
     for f in ['date','cmrk_ath_date','cmrk_atl_date','cmrk_last_updated']:
         df[f] = df[f].dt.date
     
     df['data_ts'] = df['data_ts'].dt.tz_localize(None)
 
+    # Stable row order (the query result order is not), so unchanged rows keep their sheet position and new days are appended
+    df = df.sort_values(['date','coin_id'], ignore_index=True)
+
+    gs_client = get_gs_client()
+
+    if gsheet_split:
+        df, df_snapshot = split_snapshot(df)
+
+        write_to_gsheet(df_snapshot, spreadsheet_id='1bvZPl_vHrGyoGHw9q8TJ23MHuUdPuVHhAf6rDSS3U9s',
+                            worksheet_id=None,
+                            gs_client=gs_client,
+                            clear_old_data=True,
+                            new_title='cgc_a_market_snapshot_processed',
+                            sync=gsheet_sync)
+
     write_to_gsheet(df, spreadsheet_id='1bvZPl_vHrGyoGHw9q8TJ23MHuUdPuVHhAf6rDSS3U9s',
                         worksheet_id=651357280,
                         gs_client=gs_client,
                         clear_old_data=True,
-                        new_title='cgc_a_market_historical_processed')
+                        new_title='cgc_a_market_historical_processed',
+                        sync=gsheet_sync)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+from cg_schema import HISTORY_COLUMNS
+
+# FEATURE DECLARATIONS
+# Each derived column of cg_data_c_processed is declared once and can be evaluated two ways:
+# - `evaluate(df)`: vectorized over the whole frame (NumPy masks / np.select / group transforms, no row-wise apply)
+# - `to_sql()`: the same expression as portable SQL (BigQuery and DuckDB), to compute it inside the warehouse
+
+_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+def _mask(series, op, value):
+    # Comparisons with a missing value are False, as in SQL (Arrow-backed columns return <NA> instead)
+    return np.asarray(_OPERATORS[op](series, value).fillna(False), dtype=bool)
+
+def _safe_divide(numerator, denominator):
+    # x / 0 gives NaN instead of +/-inf, like `x / NULLIF(0, 0)` in SQL
+    return numerator / denominator.where(denominator != 0)
+
+class Ratio:
+    """
+    `numerator / denominator` row by row. A zero denominator gives a missing value instead of infinity.
+    """
+
+    def __init__(self, name, numerator, denominator):
+        self.name = name
+        self.numerator = numerator
+        self.denominator = denominator
+        self.inputs = [numerator, denominator]
+
+    def evaluate(self, df):
+        return _safe_divide(df[self.numerator], df[self.denominator])
+
+    def to_sql(self):
+        return f'{self.numerator} / NULLIF({self.denominator}, 0)'
+
+class Share:
+    """
+    Share of `column` in its total over the rows with the same `partition_by` values and, with `day_col`, the same
+    calendar day of `day_col` (e.g. one coin's market cap against the market cap of every coin on the same day).
+
+    The day is used rather than the exact timestamp: the latest market chart point of each coin is its fetch time, which
+    differs from coin to coin, so grouping on it would leave every coin alone (share 1.0) on the current day.
+    """
+
+    def __init__(self, name, column, partition_by=(), day_col=None):
+        self.name = name
+        self.column = column
+        self.partition_by = list(partition_by)
+        self.day_col = day_col
+        self.inputs = [column] + self.partition_by + ([day_col] if day_col else [])
+
+    def evaluate(self, df):
+        keys = [df[col] for col in self.partition_by]
+        if self.day_col:
+            keys.append(pd.to_datetime(df[self.day_col]).dt.normalize())
+        if keys:
+            total = df.groupby(keys, dropna=False)[self.column].transform('sum')
+        else:
+            total = pd.Series(df[self.column].sum(), index=df.index)
+        return _safe_divide(df[self.column], total)
+
+    def to_sql(self):
+        keys = self.partition_by + ([f'CAST({self.day_col} AS DATE)'] if self.day_col else [])
+        window = f'PARTITION BY {", ".join(keys)}' if keys else ''
+        return f'{self.column} / NULLIF(SUM({self.column}) OVER ({window}), 0)'
+
+class Classify:
+    """
+    Label `column` with the first matching case, in order, like np.select / SQL CASE.
+
+    Parameters:
+    - cases (list): (operator, threshold, label) tuples, operator being '>', '>=', '<' or '<='.
+    - default (str): Label when no case matches, including missing values.
+    """
+
+    def __init__(self, name, column, cases, default):
+        self.name = name
+        self.column = column
+        self.cases = cases
+        self.default = default
+        self.inputs = [column]
+
+    def evaluate(self, df):
+        conditions = [_mask(df[self.column], op, value) for op, value, _ in self.cases]
+        labels = [label for _, _, label in self.cases]
+        return pd.Series(np.select(conditions, labels, default=self.default), index=df.index, dtype=object)
+
+    def to_sql(self):
+        whens = ' '.join(f"WHEN {self.column} {op} {value} THEN '{label}'" for op, value, label in self.cases)
+        return f"CASE {whens} ELSE '{self.default}' END"
+
+# FEATURE REGISTRY
+
+FEATURES = [
+    Share('market_dominance', 'mkch_market_cap', day_col='date'),
+    Ratio('circulation_percentage', 'cmrk_circulating_supply', 'cmrk_total_supply'),
+    Classify('price_change_classification', 'cmrk_price_change_percentage_24h_in_currency',
+             cases=[('>', 0, 'Bullish')], default='Bearish'),
+    Ratio('liquidity_score', 'cmrk_total_volume', 'cmrk_market_cap'),
+    Classify('performance_trend_1y', 'cmrk_price_change_percentage_1y_in_currency',
+             cases=[('>', 100, 'High Growth'), ('>=', 0, 'Moderate'), ('<', 0, 'Decline')], default='-'),
+]
+
+def compute_features(df, features=FEATURES):
+    """Add every feature column to `df` in one pass and return the new frame."""
+    return df.assign(**{feature.name: feature.evaluate(df) for feature in features})
+
+def per_date_features(features=FEATURES):
+    """
+    Return the names of the features that can differ between two dates of the same coin (they read a history column,
+    e.g. a per-day share), as opposed to the ones computed from the per-coin snapshot columns only.
+    """
+    return [feature.name for feature in features if set(feature.inputs) & set(HISTORY_COLUMNS)]
+
+def features_sql(features=FEATURES):
+    """Return the 'expression AS name' select items computing `features` inside the warehouse."""
+    return [f'{feature.to_sql()} AS {feature.name}' for feature in features]
@@ -0,0 +1,7 @@
+# TABLE LAYOUT
+# Column groups shared by the pipeline scripts (cg_data_a_merge_init, cg_data_c_processed), kept free of imports so
+# that reading them does not load the fetch stack.
+
+# History columns carried into cgc_a_market_historical_data / cgc_fact_market_daily (the only ones used downstream)
+HISTORY_COLUMNS = ['date', 'coin_id', 'mkch_price', 'mkch_market_cap', 'mkch_volume',
+                   'ohlc_open', 'ohlc_high', 'ohlc_low', 'ohlc_close']
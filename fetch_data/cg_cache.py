@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'cg_http_cache.sqlite')
+
+# A window that reaches into the current UTC day ends with today's live "now" point and the candle that has not closed
+# yet, so it is only reused for a few minutes (within a run, or an immediate re-run), never for the rest of the day.
+LIVE_WINDOW_TTL = 5 * 60
+
+ENDPOINT_TTLS = [
+    # Relative `days=N` windows always end now.
+    (re.compile(r'^/coins/[^/]+/market_chart$'), LIVE_WINDOW_TTL),
+    (re.compile(r'^/coins/[^/]+/ohlc$'), LIVE_WINDOW_TTL),
+    # An explicit from/to range that ended before today never changes.
+    (re.compile(r'^/coins/[^/]+/market_chart/range$'), 30 * 24 * 3600),
+    (re.compile(r'^/coins/markets$'), 5 * 60),
+    (re.compile(r'^/search/trending$'), 10 * 60),
+    (re.compile(r'^/simple/price$'), 60),
+]
+
+def _utc_day_start(now):
+    return datetime.fromtimestamp(now, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+def endpoint_ttl(path, params=None, now=None):
+    """
+    Return how many seconds a response for `path` stays fresh, or 0 if the endpoint must not be cached.
+    A `/market_chart/range` request whose `to` falls inside the current UTC day is treated like `/market_chart`.
+    """
+    now = time.time() if now is None else now
+
+    for pattern, ttl in ENDPOINT_TTLS:
+        if pattern.match(path):
+            if path.endswith('/range') and float((params or {}).get('to', now)) >= _utc_day_start(now):
+                ttl = LIVE_WINDOW_TTL
+            return ttl
+
+    return 0
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for raw CoinGecko response bodies, stored in SQLite.
+
+    Entries are keyed by endpoint path and query parameters and expire according to ENDPOINT_TTLS. When the total
+    stored size exceeds `max_bytes`, the least recently used entries are evicted.
+
+    Parameters:
+    - path (str): SQLite file location. Default: DEFAULT_CACHE_PATH (`.cache/` in the repository root).
+    - max_bytes (int): Size bound for all cached bodies. Default: 512 MB.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=512 * 1024 * 1024):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY,
+                                path TEXT NOT NULL,
+                                body BLOB NOT NULL,
+                                size INTEGER NOT NULL,
+                                expires_at REAL NOT NULL,
+                                last_access REAL NOT NULL)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(path, params=None):
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if v is not None)
+        return hashlib.sha256(repr((path, items)).encode()).hexdigest()
+
+    def get(self, path, params=None):
+        """Return the cached body (bytes) for the request, or None when missing or expired."""
+        key = self.make_key(path, params)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute('SELECT body, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, path, params, body):
+        """Store a response body if its endpoint is cacheable, then evict LRU entries above `max_bytes`."""
+        now = time.time()
+        ttl = endpoint_ttl(path, params, now)
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                               (self.make_key(path, params), path, body, len(body), now + ttl, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
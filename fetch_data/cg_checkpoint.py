@@ -0,0 +1,80 @@
+import os
+import pickle
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.state', 'cg_checkpoints.sqlite')
+
+class CheckpointStore:
+    """
+    Completed fetch units of a pipeline run, so a failed run can be resumed without refetching them.
+
+    A unit is one (endpoint, coin_id, window) fetch, stored with its parsed DataFrame (pickled: dtypes are kept and a unit
+    is cheap to store or replay; the file is local state written by the pipeline only).
+    Units belong to a run key (e.g. the run date and currency); opening the store with another run key, or without
+    `resume`, discards the units left by earlier runs.
+
+    Parameters:
+    - run_key (str): Identifies the runs whose units may be reused, e.g. '2024-01-01|usd|6'.
+    - path (str): SQLite file location. Default: DEFAULT_CHECKPOINT_PATH (`.state/` in the repository root).
+    - resume (bool): Keep the units of an unfinished earlier run with the same `run_key`. Default: False.
+    """
+
+    def __init__(self, run_key, path=DEFAULT_CHECKPOINT_PATH, resume=False):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.run_key = run_key
+        self.replayed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # One small commit per unit from the fetch threads: WAL keeps each commit cheap, and survives a process crash
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS checkpoints (
+                                run_key TEXT NOT NULL,
+                                endpoint TEXT NOT NULL,
+                                coin_id TEXT NOT NULL,
+                                window TEXT NOT NULL,
+                                data BLOB NOT NULL,
+                                created_at TEXT NOT NULL,
+                                PRIMARY KEY (run_key, endpoint, coin_id, window))''')
+        if resume:
+            self._conn.execute('DELETE FROM checkpoints WHERE run_key != ?', (run_key,))
+        else:
+            self._conn.execute('DELETE FROM checkpoints')
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM checkpoints WHERE run_key = ?', (self.run_key,)).fetchone()[0]
+
+    def get(self, endpoint, coin_id, window):
+        """Return the stored DataFrame of a completed unit, or None."""
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM checkpoints WHERE run_key = ? AND endpoint = ? AND coin_id = ? AND window = ?',
+                                     (self.run_key, endpoint, coin_id, str(window))).fetchone()
+            if row is None:
+                return None
+            self.replayed += 1
+        return pickle.loads(row[0])
+
+    def put(self, endpoint, coin_id, window, df):
+        """Persist a completed unit."""
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        created_at = datetime.now().replace(microsecond=0).isoformat()
+
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)',
+                               (self.run_key, endpoint, coin_id, str(window), data, created_at))
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every unit, once the run they belong to has completed."""
+        with self._lock:
+            self._conn.execute('DELETE FROM checkpoints')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,182 @@
+import os
+import random
+import threading
+import time
+import requests
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+
+from fetch_data.cg_json import get_json_decoder
+from fetch_data.cg_metrics import get_metrics
+
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value):
+    """Convert a `Retry-After` header (delay in seconds or an HTTP date) to seconds. Returns None if absent/invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class CoinGeckoClient:
+    """
+    Shared HTTP client for the CoinGecko API.
+
+    Owns one pooled keep-alive `requests.Session` (gzip enabled, auth header set once), so the several hundred
+    calls of a pipeline run reuse open TCP/TLS connections instead of paying a fresh handshake per request.
+
+    Parameters:
+    - cg_apikey (str): CoinGecko API key, sent as the 'x-cg-demo-api-key' header.
+    - base_url (str): API root. Default: the COINGECKO_BASE_URL environment variable (e.g. a local mock server for
+      benchmarks), then COINGECKO_BASE_URL.
+    - pool_size (int): Maximum number of kept-alive connections. Should be >= the number of concurrent requests.
+    - timeout (float): Seconds to wait for the server before giving up on a request. Default: 30.
+    - rate_limiter (TokenBucket / AdaptiveRateLimiter, optional): Acquired before every attempt. An adaptive limiter
+      is also told about throttled and successful responses so the whole run slows down and ramps back up together.
+    - max_retries (int): Retries for HTTP 429 / 5xx responses and connection errors before giving up. Default: 5.
+    - backoff_base (float): First backoff delay in seconds, doubled on every retry (with full jitter). Default: 2.
+    - backoff_max (float): Upper bound for a single backoff delay in seconds. Default: 60.
+    - cache (ResponseCache, optional): On-disk response cache. Fresh cached bodies are served without touching the
+      network or the rate limiter; successful responses are written back with their endpoint's TTL.
+    - json_backend (str): JSON decoder for response bodies: 'auto' (default), 'orjson', 'simdjson' or 'stdlib'.
+      Bodies are decoded straight from the raw bytes; see fetch_data.cg_json.get_json_decoder.
+    """
+
+    def __init__(self, cg_apikey, base_url=None, pool_size=10, timeout=30, rate_limiter=None,
+                 max_retries=5, backoff_base=2, backoff_max=60, cache=None, json_backend='auto'):
+        if not cg_apikey:
+            raise ValueError("cg_apikey is required.")
+
+        self.base_url = (base_url or os.getenv('COINGECKO_BASE_URL') or COINGECKO_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self.decode = get_json_decoder(json_backend)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "accept-encoding": "gzip, deflate",
+            "x-cg-demo-api-key": cg_apikey,
+        })
+
+    def get(self, path, params=None):
+        """
+        Send a GET request to `base_url + path` and return the decoded JSON payload.
+
+        Throttled (429), transient server errors (5xx) and connection failures are retried up to `max_retries`
+        times. The delay honours the server's `Retry-After` header when present (plus a small jitter), otherwise it is
+        an exponential backoff with full jitter. Raises `requests.RequestException` (including HTTPError for non-2xx responses)
+        once the retries are exhausted.
+
+        Every call is recorded in fetch_data.cg_metrics (status, retries, bytes, network / limiter / backoff / decode time).
+        """
+        metrics = get_metrics()
+
+        if self.cache is not None:
+            body = self.cache.get(path, params)
+            if body is not None:
+                decode_start = time.perf_counter()
+                data = self.decode(body)
+                metrics.record_request(path, None, decode=time.perf_counter() - decode_start, payload_bytes=len(body),
+                                       cache_hit=True)
+                return data
+
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        stats = {'status': None, 'latency': 0.0, 'limiter_wait': 0.0, 'backoff': 0.0, 'decode': 0.0, 'payload_bytes': 0}
+
+        try:
+            while True:
+                if self.rate_limiter is not None:
+                    stats['limiter_wait'] += self.rate_limiter.acquire() or 0.0
+
+                request_start = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    stats['latency'] += time.perf_counter() - request_start
+                    if attempt >= self.max_retries:
+                        raise
+                    stats['backoff'] += self._backoff(attempt, None, throttled=False)
+                    attempt += 1
+                    continue
+                stats['latency'] += time.perf_counter() - request_start
+                stats['status'] = response.status_code
+
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    stats['backoff'] += self._backoff(attempt, retry_after, throttled=response.status_code == 429)
+                    attempt += 1
+                    continue
+
+                response.raise_for_status()
+
+                if hasattr(self.rate_limiter, 'on_success'):
+                    self.rate_limiter.on_success()
+
+                body = response.content
+                stats['payload_bytes'] = len(body)
+                if self.cache is not None:
+                    self.cache.set(path, params, body)
+
+                decode_start = time.perf_counter()
+                data = self.decode(body)
+                stats['decode'] = time.perf_counter() - decode_start
+                return data
+        finally:
+            metrics.record_request(path, retries=attempt, **stats)
+
+    def _backoff(self, attempt, retry_after, throttled):
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if throttled and hasattr(self.rate_limiter, 'on_throttle'):
+            self.rate_limiter.on_throttle(delay)
+        time.sleep(delay)
+        return delay
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(cg_apikey):
+    """Return the shared client for `cg_apikey`, creating it with default settings on first use."""
+    with _clients_lock:
+        client = _clients.get(cg_apikey)
+        if client is None:
+            client = _clients[cg_apikey] = CoinGeckoClient(cg_apikey)
+        return client
+
+def configure_client(cg_apikey, **kwargs):
+    """
+    Create the shared client for `cg_apikey` with custom settings (see CoinGeckoClient), replacing any existing one.
+    Every `cg_fetch_*` function called afterwards with the same key uses the new client.
+    """
+    client = CoinGeckoClient(cg_apikey, **kwargs)
+    with _clients_lock:
+        previous = _clients.get(cg_apikey)
+        _clients[cg_apikey] = client
+    if previous is not None:
+        previous.close()
+    return client
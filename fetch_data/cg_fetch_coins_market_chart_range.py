@@ -6,6 +6,9 @@ from datetime import datetime, timezone
 from dotenv import load_dotenv
 load_dotenv()
 
+from fetch_data.cg_client import get_client
+from fetch_data.cg_parse import parse_market_chart
+
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -80,7 +83,6 @@ def cg_fetch_coins_market_chart_range(cg_apikey, id: str, from_date: str, to_dat
     end_unix = convert_unix('human_date',to_date + " 00:00:00",unix_output_format='seconds')
 
     # Process Fetch Data
-    url = f"https://api.coingecko.com/api/v3/coins/{id}/market_chart/range"
     params = {
         "vs_currency": vs_currency,
         "from" : start_unix,
@@ -88,22 +90,11 @@ def cg_fetch_coins_market_chart_range(cg_apikey, id: str, from_date: str, to_dat
         "precision": precision,
         "interval": interval
     }
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": cg_apikey
-    }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        df = pd.DataFrame({
-                            "date": [pd.to_datetime(entry[0], unit="ms") for entry in data["prices"]],
-                            "price": [entry[1] for entry in data["prices"]],
-                            "market_cap": [entry[1] for entry in data["market_caps"]],
-                            "volume": [entry[1] for entry in data["total_volumes"]],
-                        })
+        data = get_client(cg_apikey).get(f"/coins/{id}/market_chart/range", params=params)
+
+        df = parse_market_chart(data)
         df.insert(0, 'data_ts', datetime.now().replace(microsecond=0))
         df.insert(1, 'currency', vs_currency)
         df.insert(2, 'id', id)
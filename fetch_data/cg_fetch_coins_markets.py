@@ -7,6 +7,9 @@ from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
+from fetch_data.cg_client import get_client
+from fetch_data.cg_fetch_engine import fetch_concurrent
+
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -41,7 +44,6 @@ def cg_fetch_coins_markets(cg_apikey, vs_currency='usd', ids=None, order='market
     if page < 1:
         raise ValueError("page must be a positive integer.")
     
-    url = "https://api.coingecko.com/api/v3/coins/markets"
     params = {
         "vs_currency": vs_currency,
         "ids": ','.join(ids) if ids else None,
@@ -53,15 +55,9 @@ def cg_fetch_coins_markets(cg_apikey, vs_currency='usd', ids=None, order='market
         "locale": locale,
         "precision": precision,
     }
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": cg_apikey,
-    }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = get_client(cg_apikey).get("/coins/markets", params=params)
         df = pd.DataFrame(data)
         df.insert(0, 'data_ts', datetime.now().replace(microsecond=0))
         df.insert(1, 'currency', vs_currency)
@@ -147,6 +143,77 @@ def cg_fetch_coins_markets(cg_apikey, vs_currency='usd', ids=None, order='market
         print(f"\033[1;31mAn error occurred while processing the data: {e}\033[0m")
         return pd.DataFrame()
 
+MARKETS_MAX_PER_PAGE = 250
+MARKETS_MAX_IDS_CHARS = 4000 # Keeps the comma-joined 'ids' query parameter well below common URL length limits
+
+def chunk_ids(ids, max_per_chunk=MARKETS_MAX_PER_PAGE, max_chars=MARKETS_MAX_IDS_CHARS):
+    """Split a list of coin IDs into chunks that fit both the per-page limit and the URL length budget."""
+    chunks, chunk, chunk_chars = [], [], 0
+
+    for coin_id in ids:
+        if chunk and (len(chunk) >= max_per_chunk or chunk_chars + len(coin_id) + 1 > max_chars):
+            chunks.append(chunk)
+            chunk, chunk_chars = [], 0
+        chunk.append(coin_id)
+        chunk_chars += len(coin_id) + 1
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+def cg_fetch_coins_markets_bulk(cg_apikey, vs_currency='usd', ids=None, top_n=None, order='market_cap_desc',
+                                per_page=MARKETS_MAX_PER_PAGE, max_in_flight=5, **kwargs):
+    """
+    Fetch market data for a large coin universe with as few `coins/markets` calls as possible.
+
+    - `top_n` pulls the top N coins (by `order`) across as many pages of `per_page` as needed.
+    - `ids` can be any number of coin IDs; it is split into chunks that fit the per-page and URL length limits.
+    All pages/chunks are fetched concurrently and returned as one de-duplicated frame (top coins first).
+
+    Arguments:
+    - ids (list): Coin IDs to fetch in addition to the top N. Default: None.
+    - top_n (int): Number of top coins to fetch. Default: None (only `ids`).
+    - per_page (int): Page size used for each call. Valid values: 1...250. Default: 250.
+    - max_in_flight (int): Maximum number of concurrent calls. Default: 5.
+    - kwargs: Passed through to cg_fetch_coins_markets (sparkline, price_change_percentage, locale, precision).
+
+    Returns:
+    - pd.DataFrame: Same columns as cg_fetch_coins_markets, one row per coin_id.
+    """
+    if per_page < 1 or per_page > MARKETS_MAX_PER_PAGE:
+        raise ValueError(f"per_page must be between 1 and {MARKETS_MAX_PER_PAGE}.")
+
+    calls = []
+    if top_n:
+        top_per_page = min(per_page, top_n)
+        calls += [(None, page, top_per_page) for page in range(1, -(-top_n // top_per_page) + 1)]
+    if ids:
+        calls += [(chunk, 1, per_page) for chunk in chunk_ids(list(dict.fromkeys(ids)), max_per_chunk=per_page)]
+
+    if not calls:
+        return pd.DataFrame()
+
+    def fetch_call(call):
+        call_ids, page, call_per_page = call
+        return cg_fetch_coins_markets(cg_apikey, vs_currency=vs_currency, ids=call_ids, order=order,
+                                      per_page=call_per_page, page=page, **kwargs)
+
+    results = fetch_concurrent(fetch_call, calls, max_in_flight=max_in_flight)
+
+    top_frames = [df for (call_ids, _, _), df, error in results if error is None and call_ids is None and not df.empty]
+    ids_frames = [df for (call_ids, _, _), df, error in results if error is None and call_ids is not None and not df.empty]
+
+    frames = []
+    if top_frames:
+        frames.append(pd.concat(top_frames, ignore_index=True).head(top_n))
+    frames += ids_frames
+
+    if not frames:
+        return pd.DataFrame()
+
+    return pd.concat(frames, ignore_index=True).drop_duplicates(subset='coin_id', keep='first').reset_index(drop=True)
+
 if __name__ == "__main__":
     
     try:
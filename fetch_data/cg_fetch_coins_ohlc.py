@@ -6,6 +6,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
+from fetch_data.cg_client import get_client
+
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -13,6 +15,22 @@ ohlc_day_options = [1, 7, 14, 30, 90, 180, 365]
 # The list above will be used in another script. It represents the allowed options for the 'days' parameter when sending the request.
 # During testing, it was found that not all numbers are accepted for this parameter.
 
+def ohlc_days_for(needed_days, max_days):
+    """
+    Pick the 'days' option that covers `needed_days` without changing candle granularity.
+
+    The full window uses the largest option <= `max_days`. Smaller (incremental) requests use the smallest option
+    >= `needed_days` that falls in the same granularity band (1-2 days: 30m, 3-30 days: 4h, 31+ days: 4d), so
+    incrementally loaded candles match the ones already stored.
+    """
+    def band(days):
+        return 0 if days <= 2 else 1 if days <= 30 else 2
+
+    full_days = max([num for num in ohlc_day_options if num <= max_days])
+    candidates = [num for num in ohlc_day_options if band(num) == band(full_days) and needed_days <= num <= full_days]
+
+    return min(candidates) if candidates else full_days
+
 def cg_fetch_coins_ohlc(cg_apikey, id: str, vs_currency: str = "usd", days: str = "90", precision: str = "6"):
     """
     - Get the OHLC chart (Open, High, Low, Close) of a coin based on particular coin id.
@@ -34,21 +52,14 @@ def cg_fetch_coins_ohlc(cg_apikey, id: str, vs_currency: str = "usd", days: str
     """
 
     # Process Fetch Data
-    url = f"https://api.coingecko.com/api/v3/coins/{id}/ohlc"
     params = {
         "vs_currency": vs_currency,
         "days" : days,
         "precision": precision
     }
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": cg_apikey
-    }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = get_client(cg_apikey).get(f"/coins/{id}/ohlc", params=params)
 
         df = pd.DataFrame(data, columns=["timestamp", "open", "high", "low", "close"])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def fetch_concurrent(fetch_function, items, max_in_flight=5, rate_limiter=None, on_complete=None):
+    """
+    Run `fetch_function(item)` for every item on a bounded thread pool.
+
+    Parameters:
+    - fetch_function (callable): Function taking a single item (e.g. a coin ID) and returning its result.
+    - items (list): Items to fetch. Duplicates are fetched once per occurrence.
+    - max_in_flight (int): Maximum number of requests running at the same time. Default: 5.
+    - rate_limiter (TokenBucket, optional): Shared limiter acquired before each call, so the run is paced by the
+      API's allowed calls/minute instead of a fixed sleep between requests.
+    - on_complete (callable, optional): Called as `on_complete(item, result, error)` as soon as each item finishes,
+      in completion order. Useful for progress output.
+
+    Returns:
+    - list: `(item, result, error)` tuples in the same order as `items`. `error` is None on success.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1.")
+
+    def run(item):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        return fetch_function(item)
+
+    results = [None] * len(items)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(run, item): idx for idx, item in enumerate(items)}
+
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+
+            results[idx] = (items[idx], result, error)
+            if on_complete is not None:
+                on_complete(items[idx], result, error)
+
+    return results
@@ -6,6 +6,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
+from fetch_data.cg_client import get_client
+
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -15,20 +17,12 @@ def cg_fetch_search_trending(cg_apikey):
     According to CoinGecko's documentation, this endpoint allows you to query trending search coins, NFTs, and categories on CoinGecko within the last 24 hours.
     Since we are focusing on coins, we will filter only for coins in the function.
     """
-    COINGECKO_TRENDING_URL = "https://api.coingecko.com/api/v3/search/trending"
-    HEADERS = {
-                "accept": "application/json",
-                "x-cg-demo-api-key": cg_apikey
-            }
-    
     def filter_price_changes(price_changes):
         """Filter price_change_percentage_24h to keep only 'btc' and 'usd'."""
         return {key: value for key, value in price_changes.items() if key in ['btc', 'usd']}
 
     try:
-        response = requests.get(COINGECKO_TRENDING_URL, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
+        data = get_client(cg_apikey).get("/search/trending")
         trending_coins = data.get("coins", [])
 
         # Filter price_change_percentage_24h
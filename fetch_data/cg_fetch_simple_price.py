@@ -6,6 +6,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
+from fetch_data.cg_client import get_client
+
 import logging
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -29,7 +31,6 @@ def cg_fetch_simple_price(cg_apikey, ids, vs_currencies='usd', include_market_ca
     Raises:
         Exception: If the API request fails.
     """
-    url = "https://api.coingecko.com/api/v3/simple/price"
     params = {
         "ids": ids,
         "vs_currencies": vs_currencies,
@@ -39,15 +40,9 @@ def cg_fetch_simple_price(cg_apikey, ids, vs_currencies='usd', include_market_ca
         "include_last_updated_at": str(include_last_updated_at).lower(),
         "precision": precision,
     }
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": cg_apikey
-    }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = get_client(cg_apikey).get("/simple/price", params=params)
         df = pd.DataFrame.from_dict(data, orient='index').reset_index()
         df.rename(columns={'index': 'coin'}, inplace=True)
         df['last_updated_at'] = pd.to_datetime(df['last_updated_at'], unit='s')
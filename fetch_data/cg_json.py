@@ -0,0 +1,31 @@
+import json
+
+JSON_BACKENDS = ['orjson', 'simdjson', 'stdlib']
+
+def _load_backend(name):
+    if name == 'orjson':
+        import orjson
+        return orjson.loads
+    if name == 'simdjson':
+        import simdjson
+        return simdjson.loads
+    if name == 'stdlib':
+        return json.loads
+    raise ValueError(f"Unknown JSON backend: {name}. Choose from {['auto'] + JSON_BACKENDS}.")
+
+def get_json_decoder(backend='auto'):
+    """
+    Return a function that decodes a JSON response body (bytes) into Python objects.
+
+    Parameters:
+    - backend (str): 'orjson', 'simdjson', 'stdlib' or 'auto' (default). 'auto' picks the first installed fast decoder
+      in JSON_BACKENDS order and falls back to the standard library. Naming an uninstalled backend raises ImportError.
+    """
+    if backend != 'auto':
+        return _load_backend(backend)
+
+    for name in JSON_BACKENDS:
+        try:
+            return _load_backend(name)
+        except ImportError:
+            continue
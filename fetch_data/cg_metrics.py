@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.profiles', 'cg_metrics.json')
+
+# Upper bounds (seconds) of the request latency histogram buckets, Prometheus style (cumulative, plus +Inf)
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+_COIN_PATH = re.compile(r'^/coins/(?!markets$|list$|categories)([^/]+)(/.*)?$')
+
+def split_endpoint(path):
+    """
+    Split a request path into (endpoint template, coin ID), so per-coin calls aggregate under one endpoint.
+    e.g. '/coins/bitcoin/ohlc' -> ('/coins/{id}/ohlc', 'bitcoin'), '/coins/markets' -> ('/coins/markets', None)
+    """
+    match = _COIN_PATH.match(path)
+    if match is None:
+        return path, None
+    return f"/coins/{{id}}{match.group(2) or ''}", match.group(1)
+
+class MetricsRecorder:
+    """
+    Thread-safe collector for the per-request metrics of the fetch layer and named timers (parse / pipeline stages).
+
+    Every CoinGecko API call is recorded with its endpoint, coin, HTTP status, retry count, payload bytes and where the
+    time went: `latency` (network time over all attempts), `limiter_wait` (rate limiter), `backoff` (retry sleeps) and
+    `decode` (JSON decoding). Cache hits are recorded too, with no network time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = []
+        self.timers = {}
+
+    def record_request(self, path, status, latency=0.0, limiter_wait=0.0, backoff=0.0, decode=0.0, retries=0,
+                       payload_bytes=0, cache_hit=False):
+        endpoint, coin = split_endpoint(path)
+        record = {
+            'endpoint': endpoint, 'coin': coin, 'status': status, 'retries': retries, 'bytes': payload_bytes,
+            'latency': latency, 'limiter_wait': limiter_wait, 'backoff': backoff, 'decode': decode, 'cache_hit': cache_hit,
+        }
+        with self._lock:
+            self.requests.append(record)
+
+    def record_time(self, name, seconds):
+        with self._lock:
+            count, total, longest = self.timers.get(name, (0, 0.0, 0.0))
+            self.timers[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name):
+        """Time the enclosed block under `name` (e.g. 'parse_market_chart', 'stage: fetch ohlc')."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(name, time.perf_counter() - start)
+
+    def summary(self):
+        """Aggregate the recorded requests per endpoint (counts, totals, latency histogram and percentiles)."""
+        with self._lock:
+            requests = list(self.requests)
+            timers = dict(self.timers)
+
+        endpoints = {}
+        for record in requests:
+            stats = endpoints.setdefault(record['endpoint'], {
+                'requests': 0, 'cache_hits': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'statuses': {},
+                'latency_total': 0.0, 'limiter_wait_total': 0.0, 'backoff_total': 0.0, 'decode_total': 0.0,
+                'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'latencies': [],
+            })
+            stats['requests'] += 1
+            stats['cache_hits'] += record['cache_hit']
+            stats['errors'] += not record['cache_hit'] and not (record['status'] and record['status'] < 400)
+            stats['retries'] += record['retries']
+            stats['bytes'] += record['bytes']
+            status = _status_label(record)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['latency_total'] += record['latency']
+            stats['limiter_wait_total'] += record['limiter_wait']
+            stats['backoff_total'] += record['backoff']
+            stats['decode_total'] += record['decode']
+
+            if not record['cache_hit']:
+                bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if record['latency'] <= bound), len(LATENCY_BUCKETS))
+                stats['latency_buckets'][bucket] += 1
+                stats['latencies'].append(record['latency'])
+
+        for stats in endpoints.values():
+            latencies = sorted(stats.pop('latencies'))
+            stats['latency_p50'] = _percentile(latencies, 0.50)
+            stats['latency_p95'] = _percentile(latencies, 0.95)
+            stats['latency_max'] = latencies[-1] if latencies else None
+
+        return {
+            'endpoints': endpoints,
+            'timers': {name: {'count': count, 'total': total, 'max': longest} for name, (count, total, longest) in timers.items()},
+        }
+
+    def write_json(self, path):
+        """Write the per-endpoint summary, the timers and every raw request record as JSON."""
+        payload = self.summary()
+        payload['latency_buckets'] = LATENCY_BUCKETS
+        with self._lock:
+            payload['requests'] = list(self.requests)
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2)
+
+    def write_prometheus(self, path):
+        """Write the metrics in the Prometheus text exposition format (e.g. for the node_exporter textfile collector)."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}')
+
+        endpoints = summary['endpoints']
+
+        lines.append('# HELP coingecko_request_seconds Network time per CoinGecko API call, all attempts included.')
+        lines.append('# TYPE coingecko_request_seconds histogram')
+        for endpoint, stats in endpoints.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], stats['latency_buckets']):
+                cumulative += count
+                lines.append(f'coingecko_request_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'coingecko_request_seconds_sum{{endpoint="{endpoint}"}} {stats["latency_total"]}')
+            lines.append(f'coingecko_request_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+
+        metric('coingecko_requests_total', 'counter', 'CoinGecko API calls by endpoint and final HTTP status.',
+               [({'endpoint': endpoint, 'status': status}, count)
+                for endpoint, stats in endpoints.items() for status, count in stats['statuses'].items()])
+        for name, key, help_text in [
+            ('coingecko_retries_total', 'retries', 'Retried attempts (429 / 5xx / connection errors).'),
+            ('coingecko_response_bytes_total', 'bytes', 'Response payload bytes.'),
+            ('coingecko_rate_limiter_wait_seconds_total', 'limiter_wait_total', 'Time spent waiting on the rate limiter.'),
+            ('coingecko_backoff_seconds_total', 'backoff_total', 'Time spent sleeping between retries.'),
+            ('coingecko_decode_seconds_total', 'decode_total', 'Time spent decoding JSON payloads.'),
+        ]:
+            metric(name, 'counter', help_text, [({'endpoint': endpoint}, stats[key]) for endpoint, stats in endpoints.items()])
+
+        metric('pipeline_timer_seconds_total', 'counter', 'Total time of the named parse / pipeline stage timers.',
+               [({'name': name}, stats['total']) for name, stats in summary['timers'].items()])
+        metric('pipeline_timer_calls_total', 'counter', 'Number of runs of the named timers.',
+               [({'name': name}, stats['count']) for name, stats in summary['timers'].items()])
+
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write(self, path):
+        """Write to `path` as Prometheus text if it ends with '.prom' or '.txt', as JSON otherwise."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith(('.prom', '.txt')):
+            self.write_prometheus(path)
+        else:
+            self.write_json(path)
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"{'endpoint':<30} {'calls':>6} {'cached':>6} {'errors':>6} {'retries':>7} {'MB':>8} "
+              f"{'network s':>10} {'p95 s':>7} {'limiter s':>10} {'backoff s':>10} {'decode s':>9}")
+        for endpoint, stats in sorted(summary['endpoints'].items()):
+            p95 = f"{stats['latency_p95']:.3f}" if stats['latency_p95'] is not None else '-'
+            print(f"{endpoint:<30} {stats['requests']:>6} {stats['cache_hits']:>6} {stats['errors']:>6} {stats['retries']:>7} "
+                  f"{stats['bytes'] / 1e6:>8.2f} {stats['latency_total']:>10.2f} {p95:>7} {stats['limiter_wait_total']:>10.2f} "
+                  f"{stats['backoff_total']:>10.2f} {stats['decode_total']:>9.2f}")
+        for name, stats in summary['timers'].items():
+            print(f"{name:<30} {stats['count']:>6} runs, {stats['total']:.2f} s total, {stats['max']:.2f} s max")
+
+def _status_label(record):
+    if record['cache_hit']:
+        return 'cache'
+    return str(record['status']) if record['status'] else 'error'
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+_metrics = MetricsRecorder()
+
+def get_metrics():
+    """Return the process-wide recorder that the fetch client reports to."""
+    return _metrics
+
+def reset_metrics():
+    """Start a new, empty recorder (e.g. at the start of a pipeline run) and return it."""
+    global _metrics
+    _metrics = MetricsRecorder()
+    return _metrics
@@ -0,0 +1,52 @@
+import time
+import numpy as np
+import pandas as pd
+
+from fetch_data.cg_metrics import get_metrics
+
+MARKET_CHART_SERIES = {
+    "prices": "price",
+    "market_caps": "market_cap",
+    "total_volumes": "volume",
+}
+
+def series_to_arrays(points):
+    """
+    Convert a CoinGecko `[[timestamp_ms, value], ...]` array into (timestamps int64, values float64) NumPy arrays
+    in one shot. Null values become NaN.
+    """
+    arr = np.asarray(points if points else [], dtype='float64').reshape(-1, 2)
+    return arr[:, 0].astype('int64'), arr[:, 1]
+
+def parse_market_chart(data, series=MARKET_CHART_SERIES):
+    """
+    Parse a `/market_chart` or `/market_chart/range` payload into a DataFrame with one row per timestamp.
+
+    Each series is converted to NumPy arrays and the series are joined on timestamp (outer join) instead of being
+    assumed to line up by position, so a point missing from one series leaves NaN rather than shifting the others.
+    Timestamps are converted to datetimes in a single vectorized call.
+
+    Parameters:
+    - data (dict): Decoded JSON payload containing the keys of `series`.
+    - series (dict): Payload key -> output column name. Default: prices / market_caps / total_volumes.
+
+    Returns:
+    - pd.DataFrame: Columns 'date' followed by the values of `series`, sorted by date.
+    """
+    start = time.perf_counter()
+
+    columns = []
+    for key, name in series.items():
+        if key not in data:
+            raise ValueError(f"Missing required series: {key}")
+
+        timestamps, values = series_to_arrays(data[key])
+        column = pd.Series(values, index=timestamps, name=name)
+        columns.append(column[~column.index.duplicated(keep='last')])
+
+    df = pd.concat(columns, axis=1, join='outer').sort_index()
+    df.insert(0, 'date', pd.to_datetime(df.index.to_numpy(), unit='ms'))
+    df = df.reset_index(drop=True)
+
+    get_metrics().record_time('parse_market_chart', time.perf_counter() - start)
+    return df
@@ -0,0 +1,106 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter shared by every concurrent CoinGecko request.
+
+    Tokens refill continuously at `calls_per_minute / 60` per second up to `burst`. A caller that finds the bucket
+    empty reserves its token anyway and sleeps (outside the lock) until that token would have been refilled,
+    so waiting callers are served in arrival order without polling.
+
+    Parameters:
+    - calls_per_minute (float): Allowed request rate (e.g. 30 for the Demo plan).
+    - burst (int): Maximum number of tokens that can be accumulated while idle. Default: 1 (strict pacing).
+    """
+
+    def __init__(self, calls_per_minute: float, burst: int = 1):
+        if calls_per_minute <= 0:
+            raise ValueError("calls_per_minute must be a positive number.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+
+        self.rate = calls_per_minute / 60
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def calls_per_minute(self):
+        return self.rate * 60
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Block until a request may be sent. Returns the number of seconds spent waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait = 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket whose rate adapts to the server's feedback (AIMD).
+
+    - On a throttled response (HTTP 429) the rate is cut multiplicatively and every caller is held back until the
+      server's `Retry-After` (or the computed backoff) has passed.
+    - On each successful response the rate grows additively again, up to the configured ceiling.
+
+    Parameters:
+    - calls_per_minute (float): Starting and maximum rate (the plan's allowed calls/minute).
+    - min_calls_per_minute (float): Lower bound for the rate after repeated throttling. Default: 2.
+    - decrease_factor (float): Multiplier applied to the rate on each throttle. Default: 0.5.
+    - increase_per_success (float): Calls/minute added back after each successful request. Default: 1.
+    - burst (int): See TokenBucket.
+    """
+
+    def __init__(self, calls_per_minute: float, min_calls_per_minute: float = 2, decrease_factor: float = 0.5,
+                 increase_per_success: float = 1, burst: int = 1):
+        super().__init__(calls_per_minute, burst=burst)
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1.")
+
+        self.max_rate = self.rate
+        self.min_rate = min(min_calls_per_minute / 60, self.max_rate)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_per_success / 60
+        self._blocked_until = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def on_throttle(self, retry_after=None):
+        """
+        Record a throttled response. `retry_after` (seconds) pauses every caller for at least that long.
+        Throttles arriving while callers are already paused belong to the same burst (the other in-flight requests)
+        and cut the rate only once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._blocked_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def on_success(self):
+        """Record a successful response and ramp the rate back up towards its ceiling."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
@@ -0,0 +1,151 @@
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from fetch_data.cg_fetch_coins_market_chart import cg_fetch_coins_market_chart
+from fetch_data.cg_fetch_coins_markets import cg_fetch_coins_markets_bulk
+
+class RequestPlanner:
+    """
+    Collect the data needs of one pipeline run, merge them into the minimum set of API calls and serve every caller
+    from the shared results.
+
+    - Markets: every `need_markets(top_n=..., ids=...)` is merged into one top-N page set plus the chunked IDs that
+      the top-N pages did not already return, fetched once on the first `markets()` call.
+    - Market chart series: `need_series(coin, days)` declarations for the same coin (e.g. from both the `market_chart`
+      and `market_chart_range` paths) are merged into a single call covering the widest window; each caller gets
+      its own window trimmed from that shared frame.
+
+    Parameters:
+    - cg_apikey (str): CoinGecko API key.
+    - vs_currency (str): Target currency for every request. Default: 'usd'.
+    - precision (str): Decimal places for currency price values. Default: '6'.
+    - max_in_flight (int): Maximum number of concurrent markets calls. Default: 5.
+    - markets_kwargs: Passed through to cg_fetch_coins_markets_bulk (order, sparkline, price_change_percentage, locale).
+    """
+
+    def __init__(self, cg_apikey, vs_currency='usd', precision='6', max_in_flight=5, **markets_kwargs):
+        self.cg_apikey = cg_apikey
+        self.vs_currency = vs_currency
+        self.precision = precision
+        self.max_in_flight = max_in_flight
+        self.markets_kwargs = markets_kwargs
+
+        self.series_requests = 0
+        self.series_calls = 0
+
+        self._markets_top_n = 0
+        self._markets_ids = {}
+        self._markets_top_ids = []
+        self._markets_df = None
+        self._markets_lock = threading.Lock()
+
+        self._series_days = {}
+        self._series = {}
+        self._series_locks = {}
+        self._series_lock = threading.Lock()
+
+    # MARKETS
+
+    def need_markets(self, top_n=None, ids=None):
+        """Declare that the run needs the top `top_n` coins and/or the given coin IDs."""
+        with self._markets_lock:
+            if self._markets_df is not None:
+                raise RuntimeError("Markets needs must be declared before the first markets() call.")
+            self._markets_top_n = max(self._markets_top_n, top_n or 0)
+            self._markets_ids.update(dict.fromkeys(ids or []))
+
+    def markets(self, top_n=None, ids=None):
+        """
+        Return market rows for the top `top_n` coins plus `ids`, served from the shared frame.
+        With no arguments, returns every coin fetched for the run.
+        """
+        with self._markets_lock:
+            if self._markets_df is None:
+                self._markets_df = self._resolve_markets()
+            df = self._markets_df
+
+        if df.empty or (top_n is None and ids is None):
+            return df.copy()
+
+        # The top-N rows are the ones returned by the top-N pages (in rank order), not the first rows of the frame: a
+        # failed page would otherwise shift coins fetched by ID into the top N
+        wanted = df['coin_id'].isin(self._markets_top_ids[:top_n or 0])
+        if ids:
+            wanted |= df['coin_id'].isin(ids)
+        return df[wanted].reset_index(drop=True)
+
+    def _resolve_markets(self):
+        def fetch(**kwargs):
+            return cg_fetch_coins_markets_bulk(self.cg_apikey, vs_currency=self.vs_currency, max_in_flight=self.max_in_flight,
+                                               precision=self.precision, **kwargs, **self.markets_kwargs)
+
+        df_top = fetch(top_n=self._markets_top_n) if self._markets_top_n else pd.DataFrame()
+
+        self._markets_top_ids = list(dict.fromkeys(df_top['coin_id'])) if not df_top.empty else []
+
+        # Only request the IDs that the top-N pages did not already return
+        covered = set(self._markets_top_ids)
+        missing_ids = [coin_id for coin_id in self._markets_ids if coin_id not in covered]
+        df_ids = fetch(ids=missing_ids) if missing_ids else pd.DataFrame()
+
+        frames = [df for df in [df_top, df_ids] if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).drop_duplicates(subset='coin_id', keep='first').reset_index(drop=True)
+
+    # MARKET CHART SERIES
+
+    def need_series(self, coin_id, days):
+        """Declare that the run needs `days` days of market chart data for `coin_id`."""
+        with self._series_lock:
+            self._series_days[coin_id] = max(self._series_days.get(coin_id, 0), int(days))
+
+    def _fetch_series(self, coin_id, days):
+        with self._series_lock:
+            lock = self._series_locks.setdefault(coin_id, threading.Lock())
+
+        with lock:
+            with self._series_lock:
+                self.series_requests += 1
+
+            cached = self._series.get(coin_id)
+            if cached is not None and cached[0] >= days:
+                return cached[1]
+
+            with self._series_lock:
+                self.series_calls += 1
+
+            fetch_days = max(days, self._series_days.get(coin_id, 0))
+            df = cg_fetch_coins_market_chart(self.cg_apikey, id=coin_id, vs_currency=self.vs_currency, days=str(fetch_days),
+                                             interval='daily', precision=self.precision)
+            if not df.empty:
+                self._series[coin_id] = (fetch_days, df)
+            return df
+
+    def release_series(self, coin_ids):
+        """Drop the cached series of `coin_ids` once every caller has been served (keeps memory flat when streaming)."""
+        with self._series_lock:
+            for coin_id in coin_ids:
+                self._series.pop(coin_id, None)
+                self._series_locks.pop(coin_id, None)
+
+    def market_chart(self, coin_id, days):
+        """Same output as cg_fetch_coins_market_chart(days=days, interval='daily'), served from the merged window."""
+        df = self._fetch_series(coin_id, days)
+        if df.empty:
+            return df
+
+        today_utc = pd.Timestamp(datetime.now(timezone.utc).date())
+        return df[df['date'] >= today_utc - pd.Timedelta(days=int(days))].reset_index(drop=True)
+
+    def market_chart_range(self, coin_id, from_date, to_date):
+        """Same output as cg_fetch_coins_market_chart_range (mrag_* columns), served from the merged window."""
+        today_utc = pd.Timestamp(datetime.now(timezone.utc).date())
+        df = self._fetch_series(coin_id, max(1, (today_utc - pd.Timestamp(from_date)).days + 1))
+        if df.empty:
+            return df
+
+        df = df[(df['date'] >= pd.Timestamp(from_date)) & (df['date'] <= pd.Timestamp(to_date))].reset_index(drop=True)
+        return df.rename(columns=lambda col: col.replace('mkch_', 'mrag_'))
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+DEFAULT_WATERMARK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.state', 'cg_watermarks.sqlite')
+
+class WatermarkStore:
+    """
+    Per-coin high-water marks for incremental ingestion: the last loaded `date` for each (coin_id, currency).
+
+    Parameters:
+    - path (str): SQLite file location. Default: DEFAULT_WATERMARK_PATH (`.state/` in the repository root).
+    """
+
+    def __init__(self, path=DEFAULT_WATERMARK_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS watermarks (
+                                coin_id TEXT NOT NULL,
+                                currency TEXT NOT NULL,
+                                last_date TEXT NOT NULL,
+                                updated_at TEXT NOT NULL,
+                                PRIMARY KEY (coin_id, currency))''')
+        self._conn.commit()
+
+    def get_many(self, coin_ids, currency):
+        """Return {coin_id: pd.Timestamp} for the coins that already have a watermark."""
+        with self._lock:
+            rows = self._conn.execute('SELECT coin_id, last_date FROM watermarks WHERE currency = ?', (currency,)).fetchall()
+
+        wanted = set(coin_ids)
+        return {coin_id: pd.Timestamp(last_date) for coin_id, last_date in rows if coin_id in wanted}
+
+    def is_empty(self, currency):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM watermarks WHERE currency = ?', (currency,)).fetchone()[0] == 0
+
+    def update(self, last_dates, currency):
+        """
+        Advance the watermarks. `last_dates` is {coin_id: date}; a watermark never moves backwards.
+        """
+        updated_at = datetime.now().replace(microsecond=0).isoformat()
+        rows = [(coin_id, currency, pd.Timestamp(last_date).isoformat(), updated_at) for coin_id, last_date in last_dates.items()
+                if pd.notna(last_date)]
+
+        with self._lock:
+            self._conn.executemany('''INSERT INTO watermarks VALUES (?, ?, ?, ?)
+                                      ON CONFLICT (coin_id, currency) DO UPDATE SET
+                                        last_date = MAX(last_date, excluded.last_date),
+                                        updated_at = excluded.updated_at''', rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -12,8 +12,9 @@ tasks = [
                            'currency' : 'usd',
                            'decimal_precision' : '6',
                            'last_x_days' : 60,
-                           'delay_between_request' : 3}),
-    (cg_data_c_processed,{}),
+                           'calls_per_minute' : 30,
+                           'max_in_flight' : 5}),
+    (cg_data_c_processed,{},[cg_data_a_merge_init]),
     
     ]
 